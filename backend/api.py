@@ -2,6 +2,7 @@ import os
 import sys
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 import uvicorn
 
 # --- FIX: Pathing logic to find modules in the root ---
@@ -17,25 +18,76 @@ from routes import (
     incidents_router,
     analytics_router,
     alerts_router,
-    chat_router
+    chat_router,
+    debug_router
 )
 
+import asyncio
 from contextlib import asynccontextmanager
+from fastapi.responses import JSONResponse, PlainTextResponse
+from core.registry import registry
+from core.metrics import metrics
+from core.profiling import install_profiling
+from core.response_cache import install_response_cache
+from core.serialization import FastJSONResponse
+from core.loop_monitor import loop_monitor
 from workers.alert_worker import alert_worker
+from services.email_service import email_service
+from services.credential_manager import credential_cache
+from core.read_model import read_model
+from core.rollups import analytics_rollups
+from core.lifecycle import lifecycle
+from core.logger import get_logger
+
+logger = get_logger("api")
+
+def _log_warm_failure(task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"❌ Background service warm-up failed: {task.exception()}")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Start the alert worker
+    # Startup: serve immediately, initialize Firebase/Gemini/Logging clients in the background
+    # (kept on app.state so the task isn't garbage-collected mid-run)
+    app.state.warm_task = asyncio.create_task(asyncio.to_thread(registry.warm), name="registry-warm")
+    app.state.warm_task.add_done_callback(_log_warm_failure)
+    # Watch for coroutines that block the event loop
+    if os.getenv("LOOP_MONITOR_ENABLED", "true").lower() != "false":
+        loop_monitor.start()
+    # Materialize groups/incidents in memory for the list endpoints
+    if os.getenv("READ_MODEL_ENABLED", "true").lower() != "false":
+        read_model.start(lambda: registry.get("db"))
+    # Start the alert worker
     await alert_worker.start()
     yield
+    await loop_monitor.stop()
+    await read_model.stop()
     # Shutdown: Stop the alert worker
     await alert_worker.stop()
+    # Send folded alert digests and queued emails, then close the SMTP sessions
+    await email_service.stop()
+    # Cancel bulk lifecycle jobs (each committed chunk is already consistent), then
+    # write any coalesced last_used timestamps and rollup deltas still pending
+    await lifecycle.stop()
+    await credential_cache.stop()
+    await analytics_rollups.stop()
 
 app = FastAPI(
     title="Cloud RCA - Self-Healing Dashboard",
     description="Backend API for Cloud Root Cause Analysis and Self-Healing System",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
+)
+
+# --- Response Cache + ETag/304 for polled dashboard reads (inside CORS, so CORS headers stay per-request) ---
+install_response_cache(app)
+
+# --- Response Compression (outside the cache, so cached bodies are compressed too; small bodies skip it) ---
+app.add_middleware(
+    GZipMiddleware,
+    minimum_size=int(os.getenv("GZIP_MINIMUM_SIZE", "1024")),
+    compresslevel=int(os.getenv("GZIP_COMPRESS_LEVEL", "6")),
 )
 
 # --- CORS Middleware ---
@@ -45,8 +97,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# --- Opt-in Per-Request Profiling (no middleware at all unless PROFILING_ENABLED=true) ---
+install_profiling(app)
+
 # --- Root Endpoint ---
 @app.get("/")
 async def root():
@@ -56,6 +112,22 @@ async def root():
         "version": "1.0.0"
     }
 
+# --- Readiness Endpoint (load balancer / autoscaler probe) ---
+@app.get("/ready")
+async def ready():
+    # Initializes anything still cold in a worker thread, then reports per-service status
+    await asyncio.to_thread(registry.warm)
+    is_ready = registry.is_ready()
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={"ready": is_ready, "services": registry.status(), "read_model": read_model.stats()}
+    )
+
+# --- Prometheus Metrics ---
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # --- Include Routers ---
 app.include_router(auth_router)
 app.include_router(analysis_router)
@@ -64,6 +136,7 @@ app.include_router(incidents_router)
 app.include_router(analytics_router)
 app.include_router(alerts_router)
 app.include_router(chat_router)
+app.include_router(debug_router)
 
 # Legacy endpoint for backwards compatibility
 from pydantic import BaseModel
@@ -0,0 +1,30 @@
+"""
+Request identity helpers shared by routes and debug tooling.
+
+Session tokens are base64-encoded JSON issued by routes/auth.py. They are
+not signed, so they identify a tenant but must never grant privileges:
+admin access requires an X-Admin-Token header matching ADMIN_TOKEN, and
+is disabled when ADMIN_TOKEN is unset.
+"""
+import os
+import json
+import base64
+import secrets
+
+
+def get_user_id(authorization, default="default_user"):
+    """Extract user_id from a `Bearer <base64 json>` session token."""
+    if authorization and authorization.startswith('Bearer '):
+        try:
+            token = authorization.replace('Bearer ', '')
+            return json.loads(base64.b64decode(token)).get('user_id', default)
+        except Exception:
+            return default
+    return default
+
+
+def is_admin(headers):
+    """True if the request comes from an operator allowed to use debug tooling."""
+    admin_token = os.getenv("ADMIN_TOKEN")
+    supplied = headers.get("x-admin-token")
+    return bool(admin_token and supplied and secrets.compare_digest(admin_token, supplied))
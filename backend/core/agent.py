@@ -5,19 +5,20 @@ import asyncio
 # import httpx - Moved inside function
 from datetime import datetime
 from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials, firestore
 from collections import Counter
 
 # --- FIX: Ensure Python can find modules in the parent directory ---
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from core.logger import get_logger
+logger = get_logger("agent")
+
 # --- 1. LIVE INTEGRATION ---
 try:
     from services.log_collector import authenticate, fetch_logs
-    print("📡 Live Log Collector module loaded successfully.")
+    logger.info("📡 Live Log Collector module loaded successfully.")
 except ImportError as e:
-    print(f"❌ CRITICAL ERROR: log_collector.py not found ({e}). Live fetching is impossible.")
+    logger.error(f"❌ CRITICAL ERROR: log_collector.py not found ({e}). Live fetching is impossible.")
     raise
 
 # --- 2. CONFIGURATION ---
@@ -25,39 +26,64 @@ except ImportError as e:
 parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 load_dotenv(os.path.join(parent_dir, ".env"))
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-API_URL = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-3-flash-preview:generateContent?key={GEMINI_API_KEY}"
+# GEMINI_API_URL overrides the endpoint (e.g. utils/mock_servers.py for offline load tests)
+API_URL = os.getenv("GEMINI_API_URL") or f"https://generativelanguage.googleapis.com/v1beta/models/gemini-3-flash-preview:generateContent?key={GEMINI_API_KEY}"
+
+# Shared Gemini / Logging pools, fair-shared across user_ids
+from core.fair_share import gemini_scheduler, logging_scheduler, estimate_tokens
+from core.gemini_client import gemini_client
+from core.fast_path import fast_path
+from core.registry import registry
+from core.metrics import metrics
+from core.events import bus, INCIDENT_CREATED, GROUP_UPSERTED
+from core.rollups import analytics_rollups
+from core.incident_store import write_incident, set_log_context, CHAT_FIELDS, ORIGIN_FIELD, INSTANCE_ID
+
+PROMPT_CHARS = metrics.histogram(
+    "rca_gemini_prompt_chars", "Gemini prompt size in characters", ("call",),
+    buckets=(1000, 4000, 16000, 64000, 256000, 1000000)
+)
+FIRESTORE_WRITE_SECONDS = metrics.histogram("rca_firestore_write_seconds", "Firestore write latency in the analysis path", ("op",))
+TRACES_ANALYZED = metrics.counter("rca_traces_analyzed_total", "Traces analyzed, by analysis source", ("source",))
+SCAN_SECONDS = metrics.histogram("rca_scan_seconds", "End-to-end run_analysis_for_api duration")
 
 # --- 3. FIREBASE INITIALIZATION ---
 def init_firebase():
     """Initializes Firebase and returns a Firestore client.
     Forces REST transport via environment variable to avoid gRPC connection hangs.
+    Called lazily through core.registry (registry.get("db")), never at import time.
     """
     try:
+        import firebase_admin
+        from firebase_admin import credentials, firestore
+
         # Force REST transport globally for this process
         os.environ["GOOGLE_CLOUD_FIRESTORE_FORCE_REST"] = "true"
         
-        if not firebase_admin._apps:
+        if not firebase_admin._apps and os.getenv("FIRESTORE_EMULATOR_HOST"):
+            # Local Firestore emulator (offline load tests): no service account needed
+            firebase_admin.initialize_app(options={"projectId": os.getenv("GOOGLE_CLOUD_PROJECT", "demo-cloud-rca")})
+            logger.info(f"🧪 Firebase initialized against emulator at {os.getenv('FIRESTORE_EMULATOR_HOST')}.")
+        elif not firebase_admin._apps:
             # Look for serviceAccountKey.json in the backend/ root (parent of core/)
             key_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "serviceAccountKey.json")
             if os.path.exists(key_path):
                 cred = credentials.Certificate(key_path)
                 firebase_admin.initialize_app(cred)
-                print(f"✅ Firebase initialized successfully (Forced REST from {key_path}).")
+                logger.info(f"✅ Firebase initialized successfully (Forced REST from {key_path}).")
             else:
-                print(f"⚠️ serviceAccountKey.json missing at {key_path}.")
+                logger.warning(f"⚠️ serviceAccountKey.json missing at {key_path}.")
                 return None
         
         # Standard client now honors the environment variable
         return firestore.AsyncClient()
     except Exception as e:
-        print(f"❌ Firebase Init Error: {e}")
+        logger.error(f"❌ Firebase Init Error: {e}")
         return None
 
-db = init_firebase()
-
 # --- 4. THE AI BRAIN (ASYNC) ---
-async def analyze_logs_async(log_data):
-    print("🛡️ AI Brain: Performing Deep Analysis on Cloud Traces...")
+async def analyze_logs_async(log_data, user_id="default_user", trace_id=None):
+    logger.debug("🛡️ AI Brain: Performing Deep Analysis on Cloud Traces...", extra={"trace_id": trace_id, "sampled": True})
     prompt = (
         "You are an expert Google Cloud SRE and Security Agent. Analyze these logs: "
         f"{json.dumps(log_data)} "
@@ -67,44 +93,54 @@ async def analyze_logs_async(log_data):
         "contents": [{"parts": [{"text": prompt}]}],
         "generationConfig": {"responseMimeType": "application/json", "temperature": 0.1}
     }
+    PROMPT_CHARS.observe(len(prompt), call="analysis")
+    if gemini_client.breaker.is_open():
+        logger.info("⚡ Gemini circuit open: skipping analysis.", extra={"trace_id": trace_id, "sampled": True})
+        return None
     try:
-        import httpx
-        async with httpx.AsyncClient() as client:
-            response = await client.post(API_URL, json=payload, timeout=30.0)
-            if response.status_code == 200:
-                res_json = response.json()
-                
-                # Robust parsing for safety blocks or empty responses
-                candidates = res_json.get('candidates', [])
-                if not candidates:
-                    print(f"⚠️ Gemini: No candidates returned. Blocked? {res_json.get('promptFeedback')}")
-                    return None
-                    
-                content = candidates[0].get('content', {})
-                parts = content.get('parts', [])
-                if not parts:
-                    print(f"⚠️ Gemini: Candidate exists but no parts found. Blocked? {candidates[0].get('finishReason')}")
-                    return None
-                
-                # Extract text
-                text = parts[0].get('text', '')
-                if not text:
-                    return None
+        async with gemini_scheduler.slot(user_id, tokens=estimate_tokens(prompt)):
+            response = await gemini_client.post(API_URL, payload, timeout=30.0, call="analysis")
+        if response.status_code == 200:
+            res_json = response.json()
+            
+            # Robust parsing for safety blocks or empty responses
+            candidates = res_json.get('candidates', [])
+            if not candidates:
+                logger.warning(f"⚠️ Gemini: No candidates returned. Blocked? {res_json.get('promptFeedback')}", extra={"trace_id": trace_id})
+                return None
                 
-                # Handle possible markdown blocks in response
-                text = text.replace('```json', '').replace('```', '').strip()
-                return json.loads(text)
+            content = candidates[0].get('content', {})
+            parts = content.get('parts', [])
+            if not parts:
+                logger.warning(f"⚠️ Gemini: Candidate exists but no parts found. Blocked? {candidates[0].get('finishReason')}", extra={"trace_id": trace_id})
+                return None
+            
+            # Extract text
+            text = parts[0].get('text', '')
+            if not text:
+                return None
+            
+            # Handle possible markdown blocks in response
+            text = text.replace('```json', '').replace('```', '').strip()
+            return json.loads(text)
         return None
     except Exception as e:
-        print(f"❌ Gemini Error: {e}")
+        logger.error(f"❌ Gemini Error: {e}", extra={"trace_id": trace_id})
         return None
 
 # --- 5. PROCESS TRACE (ASYNC) ---
-async def process_trace_async(trace_id, logs):
-    print(f"🧵 ANALYZING TRACE: {trace_id}")
-    analysis = await analyze_logs_async({"logs": logs})
+async def process_trace_async(trace_id, logs, user_id="default_user"):
+    logger.info(f"🧵 ANALYZING TRACE: {trace_id}", extra={"trace_id": trace_id, "user_id": user_id, "log_count": len(logs), "sampled": True})
+    # Known failure signatures are classified locally; only the rest cost a Gemini call
+    analysis = fast_path.classify(logs)
+    if analysis:
+        logger.info(f"⚡ Fast-path match for {trace_id}: {analysis['category']}", extra={"trace_id": trace_id, "category": analysis["category"], "sampled": True})
+    else:
+        analysis = await analyze_logs_async({"logs": logs}, user_id=user_id, trace_id=trace_id)
+    TRACES_ANALYZED.inc(source=analysis.get("source", "gemini") if analysis else "failed")
     if analysis:
         if len(logs) > 5: analysis['priority'] = "P0 (Auto-Escalated)"
+        db = registry.get("db")
         if db:
             try:
                 # Store first 20 logs as context for the Investigation Canvas
@@ -130,43 +166,64 @@ async def process_trace_async(trace_id, logs):
                     "priority": analysis.get('priority', 'P2'),
                     "correlation": analysis.get('correlation_insight', 'N/A'),
                     "analysis": analysis,
-                    "logs": log_context,
-                    "status": "OPEN"
+                    "status": "OPEN",
+                    ORIGIN_FIELD: INSTANCE_ID
                 }
-                await db.collection("incidents").add(incident_data)
+                with FIRESTORE_WRITE_SECONDS.time(op="incident_add"):
+                    # Log context goes to incidents/{id}/context/logs so lists never download it
+                    incident_ref = await write_incident(db, incident_data, log_context)
+                bus.publish(INCIDENT_CREATED, {"id": incident_ref.id, "data": incident_data})
+                analytics_rollups.record_incident(db, incident_ref.id, incident_data)
 
-                # 2. Upsert Group (Persistent Aggregation)
+                # 2. Upsert Group (Persistent Aggregation), denormalizing the latest analysis for group detail
                 group_ref = db.collection("groups").document(trace_id)
-                group_doc = await group_ref.get()
+                latest = {
+                    "latest_incident_id": incident_ref.id,
+                    "latest_analysis": analysis,
+                    "service_name": primary_service,
+                }
+                with FIRESTORE_WRITE_SECONDS.time(op="group_upsert"):
+                    group_doc = await group_ref.get()
+                    batch = db.batch()
 
-                if group_doc.exists:
-                    # Update existing group
-                    current_group = group_doc.to_dict()
-                    await group_ref.update({
-                        "count": current_group.get("count", 0) + len(logs),
-                        "last_seen": incident_data["timestamp"],
-                        "services": list(set(current_group.get("services", []) + service_names))
-                    })
-                else:
-                    # Create new group
-                    await group_ref.set({
-                        "id": trace_id,
-                        "name": analysis.get("cause", "Unknown Anomaly"),
-                        "category": incident_data["category"],
-                        "status": "OPEN",
-                        "severity": incident_data["priority"],
-                        "count": len(logs),
-                        "first_seen": incident_data["timestamp"],
-                        "last_seen": incident_data["timestamp"],
-                        "services": service_names,
-                        "root_cause": {
-                            "cause": analysis.get("cause"),
-                            "confidence": confidence
-                        },
-                        "route": "GCP Cloud Run"
-                    })
+                    if group_doc.exists:
+                        # Update existing group
+                        current_group = group_doc.to_dict()
+                        group_update = {
+                            "count": current_group.get("count", 0) + len(logs),
+                            "last_seen": incident_data["timestamp"],
+                            "services": list(set(current_group.get("services", []) + service_names)),
+                            # A new incident is OPEN, so a resolved or acknowledged group reopens
+                            "status": "OPEN",
+                            **latest
+                        }
+                        batch.update(group_ref, group_update)
+                        group_data = {**current_group, **group_update}
+                    else:
+                        # Create new group
+                        group_data = {
+                            "id": trace_id,
+                            "name": analysis.get("cause", "Unknown Anomaly"),
+                            "category": incident_data["category"],
+                            "status": "OPEN",
+                            "severity": incident_data["priority"],
+                            "count": len(logs),
+                            "first_seen": incident_data["timestamp"],
+                            "last_seen": incident_data["timestamp"],
+                            "services": service_names,
+                            "root_cause": {
+                                "cause": analysis.get("cause"),
+                                "confidence": confidence
+                            },
+                            "route": "GCP Cloud Run",
+                            **latest
+                        }
+                        batch.set(group_ref, group_data)
+                    set_log_context(batch, group_ref, log_context)
+                    await batch.commit()
+                bus.publish(GROUP_UPSERTED, {"id": trace_id, "data": group_data})
 
-            except Exception as e: print(f"❌ Firebase Error: {e}")
+            except Exception as e: logger.error(f"❌ Firebase Error: {e}", extra={"trace_id": trace_id})
         return (trace_id, logs, analysis)
     return (trace_id, logs, None)
 
@@ -175,30 +232,36 @@ async def run_analysis_for_api(time_range_minutes=60, max_traces=10, user_id="de
     """
     Run analysis using stored user credentials (FAST ASYNC VERSION)
     """
+    with SCAN_SECONDS.time():
+        return await _run_analysis(time_range_minutes, max_traces, user_id)
+
+async def _run_analysis(time_range_minutes, max_traces, user_id):
     try:
-        from services.credential_manager import get_credentials
+        from services.credential_manager import get_credentials_and_project
+        db = registry.get("db")
         if db is None:
             return {"results": [], "error": "Firebase not initialized"}
         
         try:
-            creds = await get_credentials(db, user_id)
-            cred_doc = await db.collection('user_credentials').document(user_id).get()
-            project_id = cred_doc.to_dict().get('project_id') if cred_doc.exists else None
+            creds, project_id = await get_credentials_and_project(db, user_id)
             
             if not project_id:
-                print(f"⚠️ WARNING: No project_id found for user {user_id}. Using default.")
+                logger.warning(f"⚠️ WARNING: No project_id found for user {user_id}. Using default.")
             
             if not creds or not creds.token:
                 raise ValueError("Credentials retrieved but token is missing or empty")
                 
-            print(f"📋 Using project_id: {project_id} for user: {user_id}")
-            print(f"🔑 Token starts with: {creds.token[:10]}... (Len: {len(creds.token)})")
+            logger.info(f"📋 Using project_id: {project_id} for user: {user_id}")
+            logger.info(f"🔑 Token starts with: {creds.token[:10]}... (Len: {len(creds.token)})")
         except ValueError as e:
-            print(f"❌ Auth Error for user {user_id}: {str(e)}")
+            logger.error(f"❌ Auth Error for user {user_id}: {str(e)}")
             return {"results": [], "error": f"No valid credentials: {str(e)}"}
         
-        # 1. Fetch Logs (Sync call group)
-        traces = fetch_logs(creds, time_range_minutes=time_range_minutes, project_id=project_id)
+        # 1. Fetch Logs (sync client, run off the event loop within the tenant's Logging share)
+        async with logging_scheduler.slot(user_id):
+            traces = await asyncio.to_thread(
+                fetch_logs, creds, time_range_minutes=time_range_minutes, project_id=project_id
+            )
         if not traces: 
             return {"results": []}
         
@@ -206,7 +269,7 @@ async def run_analysis_for_api(time_range_minutes=60, max_traces=10, user_id="de
         tasks = []
         selected_traces = list(traces.items())[:max_traces]
         for trace_id, log_list in selected_traces:
-            tasks.append(process_trace_async(trace_id, log_list))
+            tasks.append(process_trace_async(trace_id, log_list, user_id=user_id))
         
         completed_analyses = await asyncio.gather(*tasks)
             
@@ -224,13 +287,25 @@ async def run_analysis_for_api(time_range_minutes=60, max_traces=10, user_id="de
                     "action": analysis.get("action"),
                     "correlation": analysis.get("correlation_insight"),
                     "security_alert": analysis.get("security_alert"),
-                    "confidence": analysis.get("confidence")
+                    "confidence": analysis.get("confidence"),
+                    "source": analysis.get("source", "gemini")
                 })
         
-        print(f"🚀 Parallel Analysis Complete. Generated {len(results)} insights.")
-        return {"results": results}
+        fast_path_count = sum(1 for r in results if r["source"] == "fast_path")
+        logger.info(
+            f"🚀 Parallel Analysis Complete. Generated {len(results)} insights ({fast_path_count} via fast path).",
+            extra={"user_id": user_id, "traces": len(selected_traces), "insights": len(results), "fast_path": fast_path_count}
+        )
+        return {
+            "results": results,
+            "fast_path": {
+                "handled": fast_path_count,
+                "traces": len(selected_traces),
+                "ratio": round(fast_path_count / len(selected_traces), 3) if selected_traces else 0.0
+            }
+        }
     except Exception as e:
-        print(f"❌ run_analysis_for_api Error: {e}")
+        logger.error(f"❌ run_analysis_for_api Error: {e}")
         return {"results": [], "error": str(e)}
 
 # --- 7. CHATBOT LOGIC (ASYNC) ---
@@ -238,13 +313,14 @@ async def chat_with_ai_async(message, user_id="default_user"):
     """
     Chat with Gemini using broad incident context.
     """
-    print(f"💬 Chat request from {user_id}: {message[:50]}...")
+    logger.info(f"💬 Chat request from {user_id}: {message[:50]}...")
     
     context_data = []
+    db = registry.get("db")
     if db:
         try:
             # Fetch last 50 incidents for broad context
-            docs = await db.collection("incidents").order_by("timestamp", direction="DESCENDING").limit(50).get()
+            docs = await db.collection("incidents").select(CHAT_FIELDS).order_by("timestamp", direction="DESCENDING").limit(50).get()
             for doc in docs:
                 d = doc.to_dict()
                 context_data.append({
@@ -256,7 +332,7 @@ async def chat_with_ai_async(message, user_id="default_user"):
                     "time": d.get("timestamp")
                 })
         except Exception as e:
-            print(f"⚠️ Failed to fetch chat context: {e}")
+            logger.warning(f"⚠️ Failed to fetch chat context: {e}")
 
     prompt = (
         "You are 'Reliability Chatbot', a high-performance SRE assistant. "
@@ -271,22 +347,23 @@ async def chat_with_ai_async(message, user_id="default_user"):
         "contents": [{"parts": [{"text": prompt}]}],
         "generationConfig": {"temperature": 0.2} # Low temp for factual SRE advice
     }
+    PROMPT_CHARS.observe(len(prompt), call="chat")
     
+    if gemini_client.breaker.is_open():
+        return {"reply": "The AI service is temporarily unavailable. Please try again shortly."}
     try:
-        import httpx
-        async with httpx.AsyncClient() as client:
-            response = await client.post(API_URL, json=payload, timeout=20.0)
-            if response.status_code == 200:
-                res_json = response.json()
-                candidates = res_json.get('candidates', [])
-                if candidates:
-                    content = candidates[0].get('content', {})
-                    parts = content.get('parts', [])
-                    if parts:
-                        return {"reply": parts[0].get('text', "I'm unable to provide a response right now.")}
+        response = await gemini_client.post(API_URL, payload, timeout=20.0, call="chat")
+        if response.status_code == 200:
+            res_json = response.json()
+            candidates = res_json.get('candidates', [])
+            if candidates:
+                content = candidates[0].get('content', {})
+                parts = content.get('parts', [])
+                if parts:
+                    return {"reply": parts[0].get('text', "I'm unable to provide a response right now.")}
         return {"reply": "I'm having trouble connecting to my brain. Please try again."}
     except Exception as e:
-        print(f"❌ Chat Gemini Error: {e}")
+        logger.error(f"❌ Chat Gemini Error: {e}")
         return {"reply": "An error occurred while processing your request."}
 
 if __name__ == "__main__":
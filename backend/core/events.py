@@ -0,0 +1,53 @@
+"""
+In-Process Event Bus
+
+Writers publish what they just stored (e.g. "incident.created") and
+in-process consumers such as the read model react without another
+Firestore round trip. Handlers may be plain functions (run inline) or
+coroutine functions (scheduled as tasks on the running loop). A failing
+handler is logged and never breaks the publisher.
+"""
+import asyncio
+import inspect
+from collections import defaultdict
+
+from core.logger import get_logger
+
+logger = get_logger("events")
+
+INCIDENT_CREATED = "incident.created"
+INCIDENT_UPDATED = "incident.updated"
+GROUP_UPSERTED = "group.upserted"
+ALERT_RULES_CHANGED = "alert_rules.changed"
+
+
+class EventBus:
+    def __init__(self):
+        self._handlers = defaultdict(list)
+
+    def subscribe(self, topic, handler):
+        self._handlers[topic].append(handler)
+        return handler
+
+    def unsubscribe(self, topic, handler):
+        if handler in self._handlers[topic]:
+            self._handlers[topic].remove(handler)
+
+    def publish(self, topic, payload):
+        for handler in list(self._handlers[topic]):
+            try:
+                if inspect.iscoroutinefunction(handler):
+                    asyncio.get_running_loop().create_task(self._run_async(topic, handler, payload))
+                else:
+                    handler(payload)
+            except Exception as e:
+                logger.error(f"❌ Event handler for '{topic}' failed: {e}")
+
+    async def _run_async(self, topic, handler, payload):
+        try:
+            await handler(payload)
+        except Exception as e:
+            logger.error(f"❌ Event handler for '{topic}' failed: {e}")
+
+
+bus = EventBus()
@@ -0,0 +1,247 @@
+"""
+Fair-Share Scheduler for Shared Upstream Pools
+
+Weighted fair queuing across tenants (user_ids) for the Gemini and Cloud
+Logging pools, with per-tenant concurrency caps, per-tenant token budgets
+and queue-wait statistics per tenant. State for a tenant is dropped once it
+is idle: nothing active or queued and its token bucket refilled (while
+others are queued, also its last finish tag behind the virtual clock).
+"""
+import os
+import time
+import heapq
+import asyncio
+import itertools
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+
+from core.metrics import metrics
+
+# How often acquire() sweeps out idle tenants
+PRUNE_INTERVAL_SECONDS = 60.0
+
+# Per pool only: a tenant label would add a series per user id (per-tenant waits are in stats())
+QUEUE_WAIT_SECONDS = metrics.histogram("rca_scheduler_wait_seconds", "Time spent waiting for a fair-share slot", ("pool",))
+
+
+def _parse_weights(raw):
+    """Parse TENANT_WEIGHTS ("user_a:2,user_b:0.5") into a dict."""
+    weights = {}
+    for item in (raw or "").split(","):
+        if ":" not in item:
+            continue
+        tenant, weight = item.rsplit(":", 1)
+        try:
+            weights[tenant.strip()] = max(float(weight), 0.01)
+        except ValueError:
+            continue
+    return weights
+
+
+class TokenBucket:
+    """Token bucket that lets a single oversized request through by going into debt."""
+
+    def __init__(self, tokens_per_minute):
+        self.rate = tokens_per_minute / 60.0
+        self.capacity = float(tokens_per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def is_full(self):
+        return self.tokens + (time.monotonic() - self.updated) * self.rate >= self.capacity
+
+    def reserve(self, amount):
+        """Reserve `amount` tokens and return how long the caller must wait."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= amount
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class WaitStats:
+    """Queue-wait summary for one tenant."""
+
+    def __init__(self, window=512):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=window)
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def percentile(self, pct):
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "avg_wait_ms": round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            "p50_wait_ms": round(self.percentile(50) * 1000, 2),
+            "p99_wait_ms": round(self.percentile(99) * 1000, 2),
+            "max_wait_ms": round(self.max * 1000, 2),
+        }
+
+
+class FairShareScheduler:
+    """
+    Start-time fair queuing over a shared pool of `max_concurrency` slots.
+
+    Each request is tagged with a virtual finish time of
+    max(virtual_time, tenant's last finish) + cost / weight, and free slots
+    go to the smallest tag whose tenant is still under its concurrency cap.
+    A tenant that floods the queue only pushes its own tags further out.
+    """
+
+    def __init__(self, name, max_concurrency, tenant_concurrency, tenant_tokens_per_minute=0, weights=None):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.tenant_concurrency = max(1, tenant_concurrency)
+        self.tenant_tokens_per_minute = tenant_tokens_per_minute
+        self.weights = weights or {}
+
+        self._queue = []
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._last_finish = defaultdict(float)
+        self._active = 0
+        self._tenant_active = defaultdict(int)
+        self._tenant_queued = defaultdict(int)
+        self._buckets = {}
+        self._wait_stats = defaultdict(WaitStats)
+        self._pruned_at = time.monotonic()
+
+    async def acquire(self, tenant, cost=1.0, tokens=0):
+        """Wait for a slot on behalf of `tenant`."""
+        started = time.monotonic()
+        if started - self._pruned_at >= PRUNE_INTERVAL_SECONDS:
+            self._prune_idle()
+            self._pruned_at = started
+
+        if tokens and self.tenant_tokens_per_minute:
+            bucket = self._buckets.get(tenant)
+            if bucket is None:
+                bucket = self._buckets[tenant] = TokenBucket(self.tenant_tokens_per_minute)
+            delay = bucket.reserve(tokens)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        weight = self.weights.get(tenant, 1.0)
+        start_tag = max(self._virtual_time, self._last_finish[tenant])
+        finish_tag = start_tag + cost / weight
+        self._last_finish[tenant] = finish_tag
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (finish_tag, next(self._seq), start_tag, tenant, future))
+        self._tenant_queued[tenant] += 1
+        self._dispatch()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was granted just before we were cancelled
+                self.release(tenant)
+            else:
+                self._tenant_queued[tenant] -= 1
+            raise
+
+        waited = time.monotonic() - started
+        self._wait_stats[tenant].record(waited)
+        QUEUE_WAIT_SECONDS.observe(waited, pool=self.name)
+
+    def release(self, tenant):
+        self._active -= 1
+        self._tenant_active[tenant] -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, tenant, cost=1.0, tokens=0):
+        await self.acquire(tenant, cost=cost, tokens=tokens)
+        try:
+            yield
+        finally:
+            self.release(tenant)
+
+    def _dispatch(self):
+        skipped = []
+        while self._queue and self._active < self.max_concurrency:
+            entry = heapq.heappop(self._queue)
+            _, _, start_tag, tenant, future = entry
+            if future.done():
+                continue
+            if self._tenant_active[tenant] >= self.tenant_concurrency:
+                skipped.append(entry)
+                continue
+            self._virtual_time = max(self._virtual_time, start_tag)
+            self._active += 1
+            self._tenant_active[tenant] += 1
+            self._tenant_queued[tenant] -= 1
+            future.set_result(None)
+        for entry in skipped:
+            heapq.heappush(self._queue, entry)
+
+    def _prune_idle(self):
+        """Forget tenants with nothing in flight whose bucket is full and whose tags carry no credit."""
+        contended = any(not entry[4].done() for entry in self._queue)
+        tenants = set(self._last_finish) | set(self._buckets) | set(self._wait_stats)
+        for tenant in tenants:
+            if self._tenant_active.get(tenant) or self._tenant_queued.get(tenant):
+                continue
+            bucket = self._buckets.get(tenant)
+            if bucket is not None and not bucket.is_full():
+                continue
+            if contended and self._last_finish.get(tenant, 0.0) > self._virtual_time:
+                continue
+            for state in (self._last_finish, self._buckets, self._wait_stats, self._tenant_active, self._tenant_queued):
+                state.pop(tenant, None)
+
+    def stats(self):
+        tenants = set(self._wait_stats) | {t for t, n in self._tenant_active.items() if n} | {t for t, n in self._tenant_queued.items() if n}
+        return {
+            "pool": self.name,
+            "active": self._active,
+            "queued": sum(1 for entry in self._queue if not entry[4].done()),
+            "max_concurrency": self.max_concurrency,
+            "tenant_concurrency": self.tenant_concurrency,
+            "tenants": {
+                tenant: {
+                    "active": self._tenant_active.get(tenant, 0),
+                    "queued": self._tenant_queued.get(tenant, 0),
+                    "weight": self.weights.get(tenant, 1.0),
+                    **self._wait_stats[tenant].to_dict(),
+                }
+                for tenant in sorted(tenants)
+            },
+        }
+
+
+def estimate_tokens(text):
+    """Rough prompt-token estimate (~4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+_weights = _parse_weights(os.getenv("TENANT_WEIGHTS"))
+
+gemini_scheduler = FairShareScheduler(
+    "gemini",
+    max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", "32")),
+    tenant_concurrency=int(os.getenv("GEMINI_TENANT_CONCURRENCY", "8")),
+    tenant_tokens_per_minute=int(os.getenv("GEMINI_TENANT_TOKENS_PER_MINUTE", "0")),
+    weights=_weights,
+)
+
+logging_scheduler = FairShareScheduler(
+    "logging",
+    max_concurrency=int(os.getenv("LOGGING_MAX_CONCURRENCY", "8")),
+    tenant_concurrency=int(os.getenv("LOGGING_TENANT_CONCURRENCY", "2")),
+    weights=_weights,
+)
@@ -0,0 +1,148 @@
+"""
+Rule-Based Fast-Path Classifier
+
+Classifies textbook Cloud Run failures (OOM, request timeouts, IAM 403s,
+broken imports, missing env vars, quota 429s) locally with one compiled
+multi-pattern regex, producing the same analysis shape Gemini returns.
+Only traces that match no signature (or more than one) go to Gemini.
+"""
+import os
+import re
+import time
+
+# Order matters only for readability; a trace must match exactly one signature.
+SIGNATURES = [
+    {
+        "name": "oom",
+        "pattern": r"memory limit of \d+ ?[KMG]i?B exceeded|out of memory|OOMKilled",
+        "cause": "Container exceeded its memory limit and the revision was terminated (OOM).",
+        "category": "SERVICE_UNAVAILABLE",
+        "action": "Raise the Cloud Run memory limit or fix the allocation spike/leak in the failing request path.",
+        "confidence": 95,
+        "priority": "P1",
+    },
+    {
+        "name": "request_timeout",
+        "pattern": r"maximum request timeout|deadline exceeded|DEADLINE_EXCEEDED|request timed out",
+        "cause": "Request was terminated after reaching the service's maximum request timeout.",
+        "category": "NETWORK_TIMEOUT",
+        "action": "Find the slow downstream call in the trace; add a client-side timeout or raise the request timeout if the work is legitimately long.",
+        "confidence": 90,
+        "priority": "P1",
+    },
+    {
+        "name": "iam_forbidden",
+        "pattern": r"403 Caller does not have|Forbidden: 403|PERMISSION_DENIED|does not have [\w.]+ (?:access|permission)",
+        "cause": "The service account lacks an IAM permission required by the call (HTTP 403).",
+        "category": "AUTHENTICATION_FAILURE",
+        "action": "Grant the missing role to the Cloud Run service account (least privilege) and redeploy.",
+        "confidence": 93,
+        "priority": "P1",
+        "security_alert": True,
+    },
+    {
+        "name": "import_error",
+        "pattern": r"ImportError: cannot import name|ModuleNotFoundError: No module named",
+        "cause": "Broken deployment: the new revision fails to import a module or symbol.",
+        "category": "DEPENDENCY_FAILURE",
+        "action": "Roll traffic back to the last healthy revision, then fix the import or pin the dependency.",
+        "confidence": 95,
+        "priority": "P0",
+    },
+    {
+        "name": "missing_env_var",
+        "pattern": r"KeyError: '[A-Z][A-Z0-9_]*' not found in environment|environment variable '?[A-Z][A-Z0-9_]*'? (?:is )?(?:not set|missing)",
+        "cause": "A required environment variable is missing from the revision configuration.",
+        "category": "CONFIGURATION_ERROR",
+        "action": "Set the missing variable (or Secret Manager reference) on the Cloud Run service and redeploy.",
+        "confidence": 94,
+        "priority": "P0",
+    },
+    {
+        "name": "quota_exceeded",
+        "pattern": r"429 Too Many Requests|RESOURCE_EXHAUSTED|Quota exceeded for",
+        "cause": "Upstream quota or rate limit exceeded (HTTP 429).",
+        "category": "RATE_LIMITING",
+        "action": "Add retries with exponential backoff and jitter, and request a quota increase if sustained.",
+        "confidence": 88,
+        "priority": "P2",
+    },
+]
+
+# Light redaction for the summary shown on the Investigation Canvas
+_REDACTIONS = [
+    (re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+"), "[EMAIL]"),
+    (re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}\b"), "[IP]"),
+    (re.compile(r"\b(?:ya29\.|AIza)[\w-]+"), "[TOKEN]"),
+]
+
+
+def redact(text):
+    for pattern, replacement in _REDACTIONS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+class FastPathClassifier:
+    def __init__(self, signatures):
+        self.signatures = {f"sig{i}": sig for i, sig in enumerate(signatures)}
+        self._combined = re.compile(
+            "|".join(f"(?P<{key}>{sig['pattern']})" for key, sig in self.signatures.items()),
+            re.IGNORECASE,
+        )
+        self.enabled = os.getenv("FAST_PATH_ENABLED", "true").lower() != "false"
+        self.total = 0
+        self.handled = 0
+        self.classify_seconds = 0.0
+        self.by_signature = {sig["name"]: 0 for sig in signatures}
+
+    def classify(self, logs):
+        """Return an analysis dict for a known failure, or None to defer to Gemini."""
+        if not self.enabled:
+            return None
+
+        started = time.perf_counter()
+        self.total += 1
+        matched = {}
+        for log in logs:
+            message = log.get("message") or ""
+            for match in self._combined.finditer(message):
+                matched.setdefault(match.lastgroup, []).append(message)
+
+        analysis = None
+        if len(matched) == 1:
+            key, messages = next(iter(matched.items()))
+            sig = self.signatures[key]
+            services = sorted({log.get("service") or "unknown" for log in logs})
+            analysis = {
+                "cause": sig["cause"],
+                "category": sig["category"],
+                "confidence": sig["confidence"],
+                "action": sig["action"],
+                "security_alert": sig.get("security_alert", False),
+                "redacted_summary": redact(messages[0])[:300],
+                "priority": sig["priority"],
+                "correlation_insight": (
+                    f"Known signature '{sig['name']}' matched {len(messages)} of {len(logs)} log lines "
+                    f"across {', '.join(services)}."
+                ),
+                "source": "fast_path",
+            }
+            self.handled += 1
+            self.by_signature[sig["name"]] += 1
+
+        self.classify_seconds += time.perf_counter() - started
+        return analysis
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "traces": self.total,
+            "handled": self.handled,
+            "handled_ratio": round(self.handled / self.total, 3) if self.total else 0.0,
+            "avg_classify_us": round(self.classify_seconds / self.total * 1e6, 1) if self.total else 0.0,
+            "by_signature": dict(self.by_signature),
+        }
+
+
+fast_path = FastPathClassifier(SIGNATURES)
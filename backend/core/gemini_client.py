@@ -0,0 +1,239 @@
+"""
+Resilient Gemini Client
+
+Wraps the generateContent POST with a circuit breaker (trips on error rate
+or slow-call rate, fails fast while open, probes while half-open) and
+optional hedged requests that fire a second call once the first one
+exceeds a latency percentile.
+"""
+import os
+import time
+import asyncio
+from collections import deque
+
+from core.metrics import metrics
+from core.logger import get_logger
+
+logger = get_logger("gemini_client")
+
+CLOSED = "CLOSED"
+OPEN = "OPEN"
+HALF_OPEN = "HALF_OPEN"
+
+
+GEMINI_SECONDS = metrics.histogram("rca_gemini_request_seconds", "Gemini generateContent latency (including hedges)", ("call",))
+GEMINI_RESPONSES = metrics.counter("rca_gemini_responses_total", "Gemini outcomes by HTTP status, 'error' or 'circuit_open'", ("call", "status"))
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling Gemini while the breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, error_rate=0.5, slow_call_seconds=10.0, slow_call_rate=0.5,
+                 min_calls=10, window_seconds=60.0, open_seconds=30.0, half_open_probes=2):
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.trips = 0
+        self.rejected = 0
+        self._calls = deque()  # (finished_at, ok, latency)
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+
+    def is_open(self):
+        """True while the breaker is open and still cooling down (no side effects)."""
+        return self.state == OPEN and time.monotonic() - self.opened_at < self.open_seconds
+
+    def allow(self):
+        """Return True if a call may proceed right now."""
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                self.rejected += 1
+                return False
+            self.state = HALF_OPEN
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+            logger.info("🟡 Gemini circuit HALF-OPEN: probing upstream...")
+
+        if self.state == HALF_OPEN:
+            if self._probes_in_flight >= self.half_open_probes:
+                self.rejected += 1
+                return False
+            self._probes_in_flight += 1
+        return True
+
+    def release(self):
+        """Free a call slot without an outcome (the caller was cancelled, so upstream health is unknown)."""
+        if self.state == HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def record(self, ok, latency):
+        now = time.monotonic()
+        slow = latency >= self.slow_call_seconds
+
+        if self.state == HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            if ok and not slow:
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_probes:
+                    self.state = CLOSED
+                    self._calls.clear()
+                    logger.info("🟢 Gemini circuit CLOSED: upstream recovered.")
+            else:
+                self._trip(now)
+            return
+
+        self._calls.append((now, ok, latency))
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+
+        total = len(self._calls)
+        if self.state == CLOSED and total >= self.min_calls:
+            errors = sum(1 for _, call_ok, _ in self._calls if not call_ok)
+            slow_calls = sum(1 for _, _, call_latency in self._calls if call_latency >= self.slow_call_seconds)
+            if errors / total >= self.error_rate or slow_calls / total >= self.slow_call_rate:
+                self._trip(now)
+
+    def _trip(self, now):
+        self.state = OPEN
+        self.opened_at = now
+        self.trips += 1
+        self._calls.clear()
+        logger.warning(f"🔴 Gemini circuit OPEN: failing fast for {self.open_seconds:.0f}s.")
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "trips": self.trips,
+            "rejected": self.rejected,
+            "window_calls": len(self._calls),
+        }
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies."""
+
+    def __init__(self, window=200):
+        self.samples = deque(maxlen=window)
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+
+    def percentile(self, pct):
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class GeminiClient:
+    def __init__(self, breaker, hedge_percentile=0.0, hedge_min_samples=20):
+        self.breaker = breaker
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.latency = LatencyTracker()
+        self.hedges_sent = 0
+        self.hedges_won = 0
+
+    async def post(self, url, payload, timeout, call="analysis"):
+        """POST to Gemini through the breaker. Returns the httpx response."""
+        if not self.breaker.allow():
+            GEMINI_RESPONSES.inc(call=call, status="circuit_open")
+            raise CircuitOpenError("Gemini circuit is open; skipping call")
+
+        started = time.monotonic()
+        try:
+            response = await self._post_hedged(url, payload, timeout)
+        except asyncio.CancelledError:
+            # Client disconnect or shutdown: not an upstream failure, but a half-open probe slot must be returned
+            self.breaker.release()
+            raise
+        except Exception:
+            latency = time.monotonic() - started
+            self.breaker.record(False, latency)
+            GEMINI_SECONDS.observe(latency, call=call)
+            GEMINI_RESPONSES.inc(call=call, status="error")
+            raise
+
+        latency = time.monotonic() - started
+        GEMINI_SECONDS.observe(latency, call=call)
+        GEMINI_RESPONSES.inc(call=call, status=response.status_code)
+        ok = response.status_code < 500 and response.status_code != 429
+        self.breaker.record(ok, latency)
+        if response.status_code == 200:
+            self.latency.add(latency)
+        return response
+
+    def _hedge_delay(self):
+        if not self.hedge_percentile or len(self.latency.samples) < self.hedge_min_samples:
+            return None
+        return self.latency.percentile(self.hedge_percentile)
+
+    async def _post_once(self, url, payload, timeout):
+        import httpx
+        async with httpx.AsyncClient() as client:
+            return await client.post(url, json=payload, timeout=timeout)
+
+    async def _post_hedged(self, url, payload, timeout):
+        delay = self._hedge_delay()
+        if delay is None or delay >= timeout:
+            return await self._post_once(url, payload, timeout)
+
+        primary = asyncio.create_task(self._post_once(url, payload, timeout))
+        pending = {primary}
+        finished = []
+        try:
+            # Cancelling the caller here (or below) must not leave the primary request running
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return primary.result()
+
+            hedge = asyncio.create_task(self._post_once(url, payload, timeout - delay))
+            self.hedges_sent += 1
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    finished.append(task)
+                    if task.exception() is None and task.result().status_code == 200:
+                        if task is hedge:
+                            self.hedges_won += 1
+                        return task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        # Neither attempt succeeded: surface a response if we got one, else the error
+        for task in finished:
+            if task.exception() is None:
+                return task.result()
+        raise finished[-1].exception()
+
+    def stats(self):
+        return {
+            "breaker": self.breaker.stats(),
+            "hedge_percentile": self.hedge_percentile,
+            "hedges_sent": self.hedges_sent,
+            "hedges_won": self.hedges_won,
+        }
+
+
+gemini_client = GeminiClient(
+    CircuitBreaker(
+        error_rate=float(os.getenv("GEMINI_BREAKER_ERROR_RATE", "0.5")),
+        slow_call_seconds=float(os.getenv("GEMINI_BREAKER_SLOW_SECONDS", "10")),
+        slow_call_rate=float(os.getenv("GEMINI_BREAKER_SLOW_RATE", "0.5")),
+        min_calls=int(os.getenv("GEMINI_BREAKER_MIN_CALLS", "10")),
+        window_seconds=float(os.getenv("GEMINI_BREAKER_WINDOW_SECONDS", "60")),
+        open_seconds=float(os.getenv("GEMINI_BREAKER_OPEN_SECONDS", "30")),
+        half_open_probes=int(os.getenv("GEMINI_BREAKER_HALF_OPEN_PROBES", "2")),
+    ),
+    hedge_percentile=float(os.getenv("GEMINI_HEDGE_PERCENTILE", "0")),
+)
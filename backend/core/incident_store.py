@@ -0,0 +1,71 @@
+"""
+Incident Document Layout
+
+Incident documents hold only the summary fields and the analysis; the
+per-trace log context (up to 20 raw log lines, by far the largest part)
+lives in a single child document, incidents/{id}/context/logs, which only
+the detail views read. Lists and aggregations additionally project the
+fields they need with select().
+
+Incidents written before this layout still carry an embedded `logs`
+field; load_log_context() handles both.
+
+Group documents are denormalized for the Investigation Canvas: they carry
+the latest incident's analysis and id, and groups/{id}/context/logs holds
+that incident's log context, so group detail is one batched read.
+"""
+import os
+import socket
+
+CONTEXT_COLLECTION = "context"
+# Stamped on incidents and groups whose status changes after creation
+UPDATED_FIELD = "updated_at"
+LOGS_DOC = "logs"
+# Stamped on incidents with the instance that created them: only that instance's bus
+# saw them, so its alert worker checkpoint and catch-up cover just its own incidents
+ORIGIN_FIELD = "origin"
+INSTANCE_ID = os.getenv("INSTANCE_ID") or socket.gethostname()
+# Field projections for the readers that never need analysis text or logs
+LIST_FIELDS = ["trace_id", "service_name", "timestamp", "priority", "status", "category", "security_alert"]
+ALERT_FIELDS = ["trace_id", "timestamp", "priority", "redacted_text", "analysis.category"]
+# Group fields only the detail view needs (kept out of list responses)
+GROUP_DETAIL_FIELDS = ("latest_analysis",)
+# Everything but the log context, for /incidents/export
+EXPORT_FIELDS = LIST_FIELDS + ["occurrence_count", "redacted_text", "correlation", "analysis"]
+CHAT_FIELDS = ["trace_id", "service_name", "timestamp", "priority", "analysis.cause", "analysis.confidence"]
+
+
+async def write_incident(db, incident_data, log_context):
+    """Store the incident and its log context in one batched commit; returns the new document ref."""
+    ref = db.collection("incidents").document()
+    batch = db.batch()
+    batch.set(ref, incident_data)
+    set_log_context(batch, ref, log_context)
+    await batch.commit()
+    return ref
+
+
+def log_context_ref(parent_ref):
+    return parent_ref.collection(CONTEXT_COLLECTION).document(LOGS_DOC)
+
+
+def set_log_context(batch, parent_ref, log_context):
+    batch.set(log_context_ref(parent_ref), {"logs": log_context})
+
+
+async def load_log_context(incident_ref, data):
+    """Log context for an incident document (embedded in legacy docs, else the child doc)."""
+    if "logs" in data:
+        return data["logs"]
+    doc = await log_context_ref(incident_ref).get()
+    return doc.to_dict().get("logs", []) if doc.exists else []
+
+
+async def load_log_contexts(db, incidents):
+    """Log context for many (ref, data) incidents: embedded where present, the rest in one batched read."""
+    logs = {ref.id: data["logs"] for ref, data in incidents if "logs" in data}
+    refs = [log_context_ref(ref) for ref, data in incidents if "logs" not in data]
+    if refs:
+        async for snap in db.get_all(refs):
+            logs[snap.reference.parent.parent.id] = snap.to_dict().get("logs", []) if snap.exists else []
+    return logs
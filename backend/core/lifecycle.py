@@ -0,0 +1,265 @@
+"""
+Bulk Incident Lifecycle Operations
+
+Resolve, acknowledge or reopen many incidents at once, selected by id
+list, group ids or filter criteria. Each request runs as a background job:
+
+- Incidents are read a page at a time, projected to the fields the
+  rollups need; those already in the target status are skipped.
+- Changes are written in chunked batches (Firestore caps a batch at 500
+  writes). Every update is conditioned on the document's update_time, so
+  a concurrent change makes that chunk re-read and retry rather than
+  double-count in the rollups. A re-read doc already carrying the chunk's
+  own status and timestamp means the commit landed but its response was
+  lost, so it is still counted as updated.
+- After each committed chunk the analytics rollups, the read model and
+  the response cache are updated (core.rollups / core.events).
+- Touched groups then take the status their incidents imply: OPEN if any
+  incident is open, else INVESTIGATING if any is acknowledged, else RESOLVED.
+
+Progress of the last JOB_HISTORY jobs is kept in memory for
+GET /incidents/bulk/{job_id}.
+"""
+import os
+import uuid
+import asyncio
+from datetime import datetime
+from collections import OrderedDict
+
+from core.events import bus, INCIDENT_UPDATED, GROUP_UPSERTED
+from core.incident_store import UPDATED_FIELD
+from core.pagination import keyset_page
+from core.rollups import analytics_rollups
+from core.metrics import metrics
+from core.logger import get_logger
+
+logger = get_logger("lifecycle")
+
+# action -> status it sets
+ACTIONS = {"resolve": "RESOLVED", "acknowledge": "INVESTIGATING", "reopen": "OPEN"}
+BATCH_SIZE = max(1, min(int(os.getenv("LIFECYCLE_BATCH_SIZE", "500")), 500))
+PAGE_SIZE = 1000
+COMMIT_ATTEMPTS = 3
+JOB_HISTORY = 100
+# What record_status_change and the group pass need from each incident
+SELECT_FIELDS = ["trace_id", "timestamp", "priority", "status"]
+
+STATUS_UPDATES = metrics.counter("rca_bulk_status_updates_total", "Incidents visited by bulk lifecycle jobs", ("action", "result"))
+
+
+class BulkJob:
+    def __init__(self, action, criteria):
+        self.id = uuid.uuid4().hex[:12]
+        self.action = action
+        self.criteria = criteria
+        self.state = "running"
+        self.matched = 0
+        self.updated = 0
+        self.skipped = 0
+        self.failed = 0
+        self.not_found = 0
+        self.groups_updated = 0
+        self.started_at = datetime.now().isoformat()
+        self.finished_at = None
+        self.error = None
+        self.task = None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "action": self.action,
+            "status": self.state,
+            "criteria": self.criteria,
+            "matched": self.matched,
+            "updated": self.updated,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "not_found": self.not_found,
+            "groups_updated": self.groups_updated,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+def _status(data):
+    return data.get("status") or "OPEN"
+
+
+class LifecycleManager:
+    def __init__(self, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self._jobs = OrderedDict()
+
+    def start(self, db, action, ids=None, group_ids=None, filters=None, start=None, end=None):
+        """Queue a bulk status change; returns the job (poll it via get())."""
+        criteria = {"ids": len(ids) if ids else None, "group_ids": group_ids, "filters": filters, "start": start, "end": end}
+        job = BulkJob(action, {k: v for k, v in criteria.items() if v})
+        self._jobs[job.id] = job
+        while len(self._jobs) > JOB_HISTORY:
+            oldest = next(iter(self._jobs))
+            if self._jobs[oldest].state == "running":
+                break
+            self._jobs.pop(oldest)
+        job.task = asyncio.create_task(
+            self._run(job, db, ids, group_ids, filters or {}, start, end), name=f"bulk-{action}-{job.id}"
+        )
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    async def stop(self):
+        for job in self._jobs.values():
+            if job.task and not job.task.done():
+                job.task.cancel()
+
+    def stats(self):
+        running = sum(1 for job in self._jobs.values() if job.state == "running")
+        return {"jobs": len(self._jobs), "running": running, "batch_size": self.batch_size}
+
+    # --- job ---
+    async def _run(self, job, db, ids, group_ids, filters, start, end):
+        new_status = ACTIONS[job.action]
+        groups = set()
+        logger.info(f"🗂️ Bulk {job.action} {job.id} started: {job.criteria}")
+        try:
+            async for page in self._select(db, job, ids, group_ids, filters, start, end):
+                job.matched += len(page)
+                changed = [snap for snap in page if _status(snap.to_dict()) != new_status]
+                job.skipped += len(page) - len(changed)
+                STATUS_UPDATES.inc(len(page) - len(changed), action=job.action, result="skipped")
+                for i in range(0, len(changed), self.batch_size):
+                    groups.update(await self._apply(db, job, changed[i:i + self.batch_size], new_status))
+            await self._sync_groups(db, job, groups)
+            job.state = "completed"
+            logger.info(
+                f"✅ Bulk {job.action} {job.id}: {job.updated} updated, {job.skipped} unchanged, "
+                f"{job.failed} failed, {job.groups_updated} groups"
+            )
+        except asyncio.CancelledError:
+            job.state = "cancelled"
+            raise
+        except Exception as e:
+            job.state = "failed"
+            job.error = str(e)
+            logger.error(f"❌ Bulk {job.action} {job.id} failed: {e}")
+        finally:
+            job.finished_at = datetime.now().isoformat()
+
+    async def _select(self, db, job, ids, group_ids, filters, start, end):
+        """Pages of matching incident snapshots (projected to SELECT_FIELDS)."""
+        collection = db.collection("incidents")
+        if ids:
+            for i in range(0, len(ids), PAGE_SIZE):
+                refs = [collection.document(doc_id) for doc_id in ids[i:i + PAGE_SIZE]]
+                snaps = [snap async for snap in db.get_all(refs, field_paths=SELECT_FIELDS)]
+                found = [snap for snap in snaps if snap.exists]
+                job.not_found += len(snaps) - len(found)
+                yield found
+            return
+
+        for trace_id in group_ids or [filters.get("trace_id")]:
+            page_filters = {**filters, "trace_id": trace_id}
+            after = None
+            while True:
+                # Oldest-first keyset pages share the export's composite indexes
+                docs = await keyset_page(
+                    collection, "timestamp", page_filters, PAGE_SIZE,
+                    after=after, fields=SELECT_FIELDS, descending=False, start=start, end=end
+                )
+                if docs:
+                    yield docs
+                if len(docs) < PAGE_SIZE:
+                    break
+                after = (docs[-1].to_dict().get("timestamp"), docs[-1].id)
+
+    async def _apply(self, db, job, chunk, new_status):
+        """Commit one chunk with update_time preconditions, re-reading on conflict; returns touched group ids."""
+        groups = set()
+        rows = [(snap, snap.to_dict()) for snap in chunk]  # pre-write state, for the rollup deltas
+        for attempt in range(1, COMMIT_ATTEMPTS + 1):
+            now = datetime.now().isoformat()
+            batch = db.batch()
+            for snap, _ in rows:
+                batch.update(
+                    snap.reference,
+                    {"status": new_status, UPDATED_FIELD: now},
+                    option=db.write_option(last_update_time=snap.update_time),
+                )
+            try:
+                await batch.commit()
+                break
+            except Exception as e:
+                if attempt == COMMIT_ATTEMPTS:
+                    job.failed += len(rows)
+                    STATUS_UPDATES.inc(len(rows), action=job.action, result="failed")
+                    logger.warning(f"⚠️ Bulk {job.action} {job.id}: chunk of {len(rows)} failed: {e}")
+                    return groups
+                # Someone else changed a document in between: re-read the chunk and drop what's already done
+                before = {snap.id: data for snap, data in rows}
+                snaps = [
+                    s async for s in db.get_all([snap.reference for snap, _ in rows], field_paths=SELECT_FIELDS + [UPDATED_FIELD])
+                ]
+                fresh = [(s, s.to_dict()) for s in snaps if s.exists]
+                # The batch is atomic: if any doc carries this attempt's stamp, the commit landed and only the response was lost
+                ours = [(s, before[s.id]) for s, data in fresh if _status(data) == new_status and data.get(UPDATED_FIELD) == now]
+                if ours:
+                    job.skipped += len(snaps) - len(ours)
+                    self._record(db, job, ours, new_status, now, groups)
+                    return groups
+                rows = [(s, data) for s, data in fresh if _status(data) != new_status]
+                job.skipped += len(snaps) - len(rows)
+                if not rows:
+                    return groups
+
+        self._record(db, job, rows, new_status, now, groups)
+        return groups
+
+    def _record(self, db, job, rows, new_status, now, groups):
+        """Roll up and publish committed changes; `rows` pairs each snapshot with its pre-write data."""
+        for snap, data in rows:
+            analytics_rollups.record_status_change(db, data, _status(data), new_status)
+            bus.publish(INCIDENT_UPDATED, {"id": snap.id, "data": {"status": new_status, UPDATED_FIELD: now}})
+            if data.get("trace_id"):
+                groups.add(data["trace_id"])
+        job.updated += len(rows)
+        STATUS_UPDATES.inc(len(rows), action=job.action, result="updated")
+
+    async def _sync_groups(self, db, job, group_ids):
+        """Set each touched group to the status its incidents imply."""
+        if not group_ids:
+            return
+        refs = [db.collection("groups").document(group_id) for group_id in group_ids]
+        current = {snap.id: snap.to_dict() async for snap in db.get_all(refs, field_paths=["status"]) if snap.exists}
+        targets = {}
+        for group_id, data in current.items():
+            status = await _derived_group_status(db, group_id)
+            if status != data.get("status"):
+                targets[group_id] = status
+
+        items = list(targets.items())
+        for i in range(0, len(items), self.batch_size):
+            now = datetime.now().isoformat()
+            batch = db.batch()
+            for group_id, status in items[i:i + self.batch_size]:
+                batch.update(db.collection("groups").document(group_id), {"status": status, UPDATED_FIELD: now})
+            await batch.commit()
+            for group_id, status in items[i:i + self.batch_size]:
+                bus.publish(GROUP_UPSERTED, {"id": group_id, "data": {"status": status, UPDATED_FIELD: now}})
+            job.groups_updated += len(items[i:i + self.batch_size])
+
+
+async def _derived_group_status(db, group_id):
+    from google.cloud.firestore_v1.base_query import FieldFilter
+
+    incidents = db.collection("incidents").where(filter=FieldFilter("trace_id", "==", group_id))
+    for status in ("OPEN", "INVESTIGATING"):
+        # Equality-only filters: served by merging single-field indexes
+        docs = await incidents.where(filter=FieldFilter("status", "==", status)).select(["status"]).limit(1).get()
+        if docs:
+            return status
+    return "RESOLVED"
+
+
+lifecycle = LifecycleManager()
@@ -0,0 +1,107 @@
+"""
+Non-Blocking Structured Logging
+
+Hot paths log through a QueueHandler; a QueueListener thread drains the
+queue and does the actual stdout writes, so request/trace coroutines
+never block on I/O. Supports levels (LOG_LEVEL), JSON output
+(LOG_FORMAT=json) and deterministic per-trace sampling of INFO/DEBUG
+lines (LOG_TRACE_SAMPLE_RATE, off by default): records logged with
+`extra={"trace_id": ..., "sampled": True}` are kept or dropped for a
+whole trace at once. Warnings and errors are never sampled.
+"""
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import logging.handlers
+import zlib
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+
+from core.metrics import metrics
+
+# Loggers are configured at import time of their modules, possibly before core.agent loads .env
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env"))
+
+ROOT_LOGGER = "rca"
+DROPPED_RECORDS = metrics.counter("rca_log_records_dropped_total", "Log records dropped because the log queue was full")
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and key != "sampled":
+                payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class TraceSampler(logging.Filter):
+    """Keep a stable fraction of per-trace INFO/DEBUG lines, chosen by trace_id."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.threshold = int(max(0.0, min(1.0, rate)) * 10000)
+
+    def filter(self, record):
+        if not getattr(record, "sampled", False) or record.levelno >= logging.WARNING:
+            return True
+        key = str(getattr(record, "trace_id", record.getMessage())).encode()
+        return zlib.crc32(key) % 10000 < self.threshold
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Never block the caller: drop (and count) records when the queue is full."""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DROPPED_RECORDS.inc()
+
+
+_listener = None
+
+
+def _configure():
+    global _listener
+    root = logging.getLogger(ROOT_LOGGER)
+    if _listener is not None:
+        return root
+
+    stream = logging.StreamHandler(sys.stdout)
+    if os.getenv("LOG_FORMAT", "text").lower() == "json":
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(logging.Formatter("%(levelname)-7s %(message)s"))
+
+    log_queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+    handler = DroppingQueueHandler(log_queue)
+    handler.addFilter(TraceSampler(float(os.getenv("LOG_TRACE_SAMPLE_RATE", "1.0"))))
+
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    root.addHandler(handler)
+    root.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return root
+
+
+def get_logger(name):
+    """Return a logger under the `rca` hierarchy, e.g. get_logger("agent")."""
+    _configure()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
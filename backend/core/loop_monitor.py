@@ -0,0 +1,120 @@
+"""
+Event-Loop Lag Monitor and Blocking-Call Detector
+
+A ticker coroutine measures how late the loop wakes it up (lag). A
+watchdog thread watches the ticker's heartbeat; when the loop has not
+ticked for longer than the threshold it captures the loop thread's stack
+and the running asyncio task, i.e. whatever is blocking the loop right
+now. Exported as metrics and through GET /debug/loop.
+"""
+import os
+import sys
+import time
+import asyncio
+import threading
+import traceback
+from collections import deque
+from datetime import datetime
+
+from core.metrics import metrics
+from core.logger import get_logger
+
+logger = get_logger("loop_monitor")
+
+LOOP_LAG_SECONDS = metrics.histogram(
+    "rca_event_loop_lag_seconds", "Event-loop scheduling lag per tick",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+LOOP_STALLS = metrics.counter("rca_event_loop_stalls_total", "Times the event loop was blocked longer than the threshold")
+LOOP_MAX_LAG = metrics.gauge("rca_event_loop_max_lag_seconds", "Largest event-loop lag seen since startup")
+
+
+class LoopMonitor:
+    def __init__(self, interval=0.1, threshold=0.25, keep=50):
+        self.interval = interval
+        self.threshold = threshold
+        self.stalls = deque(maxlen=keep)
+        self.max_lag = 0.0
+        self.ticks = 0
+        self._loop = None
+        self._loop_thread_id = None
+        self._heartbeat = time.monotonic()
+        self._task = None
+        self._watchdog = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self._task:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._tick(), name="loop-monitor")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(f"⏱️ Event-loop monitor started (stall threshold {self.threshold * 1000:.0f}ms).")
+
+    async def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _tick(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self._heartbeat = now
+            self.ticks += 1
+            LOOP_LAG_SECONDS.observe(lag)
+            if lag > self.max_lag:
+                self.max_lag = lag
+                LOOP_MAX_LAG.set(lag)
+
+    def _watch(self):
+        current = None  # the stall being tracked, if any
+        while not self._stop.wait(self.threshold / 4):
+            behind = time.monotonic() - self._heartbeat - self.interval
+            if behind > self.threshold:
+                if current is None:
+                    current = self._capture(behind)
+                    self.stalls.append(current)
+                    LOOP_STALLS.inc()
+                    logger.warning(f"🐢 Event loop blocked >{self.threshold * 1000:.0f}ms in task '{current['task']}'")
+                current["blocked_ms"] = round(behind * 1000, 1)
+            elif current is not None:
+                current["ongoing"] = False
+                current = None
+
+    def _capture(self, behind):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = traceback.format_stack(frame) if frame is not None else []
+        task = asyncio.current_task(self._loop)
+        return {
+            "detected_at": datetime.now().isoformat(),
+            "blocked_ms": round(behind * 1000, 1),
+            "ongoing": True,
+            "task": task.get_name() if task else "<callback>",
+            "coroutine": repr(task.get_coro()) if task else None,
+            "stack": [line.rstrip() for line in stack[-25:]],
+        }
+
+    def stats(self):
+        return {
+            "running": self._task is not None,
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "ticks": self.ticks,
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+            "stall_count": len(self.stalls),
+            "recent_stalls": list(reversed(self.stalls)),
+        }
+
+
+loop_monitor = LoopMonitor(
+    interval=float(os.getenv("LOOP_MONITOR_INTERVAL_MS", "100")) / 1000.0,
+    threshold=float(os.getenv("LOOP_STALL_THRESHOLD_MS", "250")) / 1000.0,
+)
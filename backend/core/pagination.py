@@ -0,0 +1,67 @@
+"""
+Keyset Pagination Cursors
+
+Lists are ordered newest-first by (sort field, document id). A cursor is
+the opaque, URL-safe encoding of the last row's key; the next page starts
+strictly after it, both in the read model (bisect) and in Firestore
+(`start_after` over the sort field and `__name__`). Every page therefore
+costs `limit` rows regardless of depth. The legacy `page` parameter is
+still honoured when no cursor is given.
+"""
+import json
+import base64
+
+CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(sort_value, doc_id):
+    raw = json.dumps([sort_value or "", doc_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Return the (sort_value, doc_id) key encoded in `token`; ValueError if malformed."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        sort_value, doc_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(sort_value, str) or not isinstance(doc_id, str):
+        raise ValueError("Invalid cursor")
+    return sort_value, doc_id
+
+
+def clamp_limit(limit):
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+async def keyset_page(collection, sort_field, filters, limit, after=None, offset=0, fields=None,
+                      descending=True, start=None, end=None):
+    """
+    Read one page of `collection` straight from Firestore, newest-first
+    unless descending=False. Equality `filters` are pushed into the query
+    (composite indexes in firestore.indexes.json), so a page reads exactly
+    `limit` documents; `fields` projects them with select(). `start`
+    (inclusive) and `end` (exclusive) bound the sort field.
+    """
+    from google.cloud.firestore import Query
+    from google.cloud.firestore_v1.base_query import FieldFilter
+
+    query = collection.select(fields) if fields else collection
+    for field, value in filters.items():
+        if value is not None:
+            query = query.where(filter=FieldFilter(field, "==", value))
+    if start is not None:
+        query = query.where(filter=FieldFilter(sort_field, ">=", start))
+    if end is not None:
+        query = query.where(filter=FieldFilter(sort_field, "<", end))
+    direction = Query.DESCENDING if descending else Query.ASCENDING
+    query = query.order_by(sort_field, direction=direction).order_by("__name__", direction=direction)
+    if after is not None:
+        sort_value, doc_id = after
+        query = query.start_after({sort_field: sort_value, "__name__": collection.document(doc_id)})
+    elif offset:
+        # Legacy page numbers: Firestore still bills the skipped documents
+        query = query.offset(offset)
+    return await query.limit(limit).get()
@@ -0,0 +1,196 @@
+"""
+Opt-in Per-Request Profiling
+
+Disabled unless PROFILING_ENABLED=true, in which case a middleware is
+installed (otherwise nothing is added to the request path at all).
+An admin request carrying `X-Profile: sample` (or `?profile=sample`) is
+profiled by a stack sampler that writes flamegraph-compatible folded
+stacks plus per-task event-loop time; `X-Profile: cprofile` writes a
+cProfile .prof instead. Artifacts land in data/profiles/ and their id is
+returned in the X-Profile-Id response header.
+
+Note: profiles cover everything running on the event loop thread while
+the request is in flight, including other concurrent requests.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import pstats
+import asyncio
+import cProfile
+import threading
+from collections import Counter
+
+from core.admin import is_admin
+from core.logger import get_logger
+
+logger = get_logger("profiling")
+
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "profiles")
+SAMPLE_INTERVAL = float(os.getenv("PROFILING_SAMPLE_INTERVAL_MS", "1")) / 1000.0
+
+# Overlapping samplers share the process-wide switch interval: the first to
+# start saves the original and the last to stop restores it
+_switch_lock = threading.Lock()
+_switch_users = 0
+_switch_original = None
+
+
+def _lower_switch_interval(interval):
+    global _switch_users, _switch_original
+    with _switch_lock:
+        if _switch_users == 0:
+            _switch_original = sys.getswitchinterval()
+        _switch_users += 1
+        sys.setswitchinterval(min(sys.getswitchinterval(), interval))
+
+
+def _restore_switch_interval():
+    global _switch_users
+    with _switch_lock:
+        _switch_users -= 1
+        if _switch_users == 0:
+            sys.setswitchinterval(_switch_original)
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+class StackSampler:
+    """Samples the event-loop thread's stack and current asyncio task on a timer thread."""
+
+    def __init__(self, loop, thread_id, interval=SAMPLE_INTERVAL):
+        self.loop = loop
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.task_samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        # A CPU-bound loop thread only releases the GIL every switch interval (5ms by default)
+        _lower_switch_interval(self.interval)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        _restore_switch_interval()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(labels))] += 1
+
+            task = asyncio.current_task(self.loop)
+            self.task_samples[task.get_name() if task else "<loop idle/callbacks>"] += 1
+
+    def write(self, base_path, wall_seconds):
+        with open(base_path + ".folded", "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        total = sum(self.task_samples.values()) or 1
+        summary = {
+            "wall_ms": round(wall_seconds * 1000, 2),
+            "samples": sum(self.task_samples.values()),
+            "sample_interval_ms": self.interval * 1000,
+            "tasks": [
+                {"task": name, "samples": count, "est_ms": round(count * self.interval * 1000, 2), "share": round(count / total, 3)}
+                for name, count in self.task_samples.most_common()
+            ],
+        }
+        with open(base_path + ".tasks.json", "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+
+def _write_cprofile(profile, base_path):
+    profile.dump_stats(base_path + ".prof")
+    with open(base_path + ".txt", "w", encoding="utf-8") as f:
+        pstats.Stats(profile, stream=f).sort_stats("cumulative").print_stats(40)
+
+
+# cProfile hooks the whole interpreter: only one profile may be enabled at a time
+# (Python 3.12+ raises otherwise), so overlapping cprofile requests fall back to sampling
+_cprofile_lock = threading.Lock()
+
+
+def _requested_mode(request):
+    mode = request.headers.get("x-profile") or request.query_params.get("profile")
+    if not mode or mode.lower() in ("0", "false", "off"):
+        return None
+    return "cprofile" if mode.lower() == "cprofile" else "sample"
+
+
+def install_profiling(app):
+    """Attach the profiling middleware if PROFILING_ENABLED=true."""
+    if os.getenv("PROFILING_ENABLED", "false").lower() != "true":
+        return False
+
+    @app.middleware("http")
+    async def profile_request(request, call_next):
+        mode = _requested_mode(request)
+        if mode is None or not is_admin(request.headers):
+            return await call_next(request)
+
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profile_id = f"{time.strftime('%Y%m%d_%H%M%S')}_{request.url.path.strip('/').replace('/', '_') or 'root'}_{uuid.uuid4().hex[:6]}"
+        base_path = os.path.join(PROFILE_DIR, profile_id)
+        started = time.perf_counter()
+
+        if mode == "cprofile" and not _cprofile_lock.acquire(blocking=False):
+            logger.warning(f"⚠️ cProfile busy with another request; sampling {request.url.path} instead")
+            mode = "sample"
+
+        if mode == "cprofile":
+            try:
+                profile = cProfile.Profile()
+                profile.enable()
+                try:
+                    response = await call_next(request)
+                finally:
+                    profile.disable()
+            finally:
+                _cprofile_lock.release()
+            await asyncio.to_thread(_write_cprofile, profile, base_path)
+        else:
+            sampler = StackSampler(asyncio.get_running_loop(), threading.get_ident())
+            sampler.start()
+            try:
+                response = await call_next(request)
+            finally:
+                sampler.stop()
+            await asyncio.to_thread(sampler.write, base_path, time.perf_counter() - started)
+
+        logger.info(f"🔬 Profiled {request.method} {request.url.path} ({mode}) -> {profile_id}")
+        response.headers["X-Profile-Id"] = profile_id
+        response.headers["X-Profile-Mode"] = mode
+        return response
+
+    logger.info("🔬 Per-request profiling enabled (admin requests with X-Profile header).")
+    return True
+
+
+def list_profiles():
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    return sorted(os.listdir(PROFILE_DIR), reverse=True)
+
+
+def profile_path(name):
+    """Resolve an artifact name inside PROFILE_DIR, refusing path traversal."""
+    path = os.path.realpath(os.path.join(PROFILE_DIR, name))
+    if not path.startswith(os.path.realpath(PROFILE_DIR) + os.sep) or not os.path.isfile(path):
+        return None
+    return path
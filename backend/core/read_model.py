@@ -0,0 +1,250 @@
+"""
+Materialized Read Model for Groups and Incidents
+
+A process-local copy of the list-view fields of every group and
+incident, kept sorted by time and indexed by status, category and
+trace_id, so list endpoints answer from memory at any depth instead of
+re-reading a fixed Firestore prefix.
+
+- Bootstrap: paged scan of both collections in the background at startup
+  (list endpoints fall back to Firestore until it completes).
+- In-process writes arrive through core.events as they happen.
+- Writes made by other processes are picked up by an incremental resync
+  every READ_MODEL_SYNC_SECONDS (documents newer than the last one seen,
+  plus documents whose `updated_at` moved, i.e. status changes).
+
+Firestore snapshot listeners would need gRPC streaming; this backend
+forces the REST transport (see core.agent.init_firebase), hence the
+event bus + resync.
+"""
+import os
+import time
+import asyncio
+from datetime import datetime, timedelta
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+from core.events import bus, INCIDENT_CREATED, INCIDENT_UPDATED, GROUP_UPSERTED
+from core.metrics import metrics
+from core.incident_store import LIST_FIELDS, GROUP_DETAIL_FIELDS, UPDATED_FIELD
+from core.logger import get_logger
+
+logger = get_logger("read_model")
+
+SYNC_SECONDS = float(os.getenv("READ_MODEL_SYNC_SECONDS", "30"))
+# Re-read this much before the watermark to catch late writes and clock skew between processes
+SYNC_OVERLAP = timedelta(seconds=float(os.getenv("READ_MODEL_SYNC_OVERLAP_SECONDS", "120")))
+PAGE_SIZE = 1000
+
+READ_MODEL_ROWS = metrics.gauge("rca_read_model_rows", "Rows held by the in-memory read model", ("table",))
+
+
+def _project_incident(doc_id, data):
+    row = {field: data.get(field) for field in LIST_FIELDS}
+    row["id"] = doc_id
+    row["status"] = row["status"] or "OPEN"
+    return row
+
+
+def _project_group(doc_id, data):
+    row = {k: v for k, v in data.items() if k not in GROUP_DETAIL_FIELDS}
+    row.setdefault("id", doc_id)
+    return row
+
+
+class _Table:
+    """Rows sorted by (sort_field, id) with one sorted key list per indexed value."""
+
+    def __init__(self, name, sort_field, index_fields, project, fields=None, updated_field=None):
+        self.name = name
+        self.fields = fields  # select() projection for the Firestore sync
+        self.sort_field = sort_field
+        self.updated_field = updated_field  # bumped by in-place updates that keep the sort value
+        self.index_fields = index_fields
+        self.project = project
+        self.rows = {}
+        self._keys = {}
+        self._order = []
+        self._indexes = {field: defaultdict(list) for field in index_fields}
+        self.watermark = ""  # newest sort value read from Firestore (bus events don't move it)
+        self.updated_watermark = ""
+
+    def __len__(self):
+        return len(self.rows)
+
+    def upsert(self, doc_id, data, merge=False):
+        """Insert or replace a row; with merge=True, `data` may be a partial update of an existing row."""
+        if merge:
+            if doc_id in self.rows:
+                data = {**self.rows[doc_id], **data}
+            elif self.sort_field not in data:
+                # A partial update (e.g. just status) of a row not held yet: without a sort key it
+                # would break page order, so leave it to the next resync (its updated_at moved)
+                return
+        row = self.project(doc_id, data)
+        self.remove(doc_id)
+        key = (row.get(self.sort_field) or "", doc_id)
+        self.rows[doc_id] = row
+        self._keys[doc_id] = key
+        insort(self._order, key)
+        for field in self.index_fields:
+            insort(self._indexes[field][row.get(field)], key)
+        READ_MODEL_ROWS.set(len(self.rows), table=self.name)
+
+    def remove(self, doc_id):
+        key = self._keys.pop(doc_id, None)
+        if key is None:
+            return
+        row = self.rows.pop(doc_id)
+        _discard(self._order, key)
+        for field in self.index_fields:
+            bucket = self._indexes[field].get(row.get(field))
+            if bucket is not None:
+                _discard(bucket, key)
+                if not bucket:
+                    del self._indexes[field][row.get(field)]
+        READ_MODEL_ROWS.set(len(self.rows), table=self.name)
+
+    def query(self, filters=None, limit=10, offset=0, after=None):
+        """
+        Newest-first rows matching all `filters` (field -> value; None means any).
+        `after` is a (sort_value, id) key from core.pagination: the page starts
+        strictly after it, found by bisection rather than by skipping rows.
+        """
+        filters = {f: v for f, v in (filters or {}).items() if v is not None}
+        # Walk the smallest matching index; check the remaining filters per row
+        keys = self._order
+        for field, value in filters.items():
+            candidate = self._indexes[field].get(value, [])
+            if len(candidate) < len(keys):
+                keys = candidate
+        start = bisect_left(keys, tuple(after)) if after is not None else len(keys)
+        results = []
+        skipped = 0
+        for i in range(start - 1, -1, -1):
+            row = self.rows[keys[i][1]]
+            if any(row.get(f) != v for f, v in filters.items()):
+                continue
+            if skipped < offset:
+                skipped += 1
+                continue
+            results.append(row)
+            if len(results) >= limit:
+                break
+        return results
+
+
+def _rewind(watermark):
+    try:
+        return (datetime.fromisoformat(watermark) - SYNC_OVERLAP).isoformat()
+    except ValueError:
+        return watermark
+
+
+def _discard(keys, key):
+    i = bisect_left(keys, key)
+    if i < len(keys) and keys[i] == key:
+        del keys[i]
+
+
+class ReadModel:
+    def __init__(self, sync_seconds=SYNC_SECONDS):
+        self.sync_seconds = sync_seconds
+        self.incidents = _Table(
+            "incidents", "timestamp", ("status", "category", "trace_id"), _project_incident,
+            fields=LIST_FIELDS + [UPDATED_FIELD], updated_field=UPDATED_FIELD
+        )
+        self.groups = _Table("groups", "last_seen", ("status", "category"), _project_group, updated_field=UPDATED_FIELD)
+        self.ready = False
+        self.last_sync = None
+        self._task = None
+        bus.subscribe(INCIDENT_CREATED, self._on_incident)
+        bus.subscribe(INCIDENT_UPDATED, self._on_incident_update)
+        bus.subscribe(GROUP_UPSERTED, self._on_group)
+
+    # --- event bus handlers (in-process writers) ---
+    def _on_incident(self, event):
+        self.incidents.upsert(event["id"], event["data"])
+
+    def _on_incident_update(self, event):
+        self.incidents.upsert(event["id"], event["data"], merge=True)
+
+    def _on_group(self, event):
+        self.groups.upsert(event["id"], event["data"], merge=True)
+
+    # --- Firestore bootstrap / resync ---
+    def start(self, get_db):
+        """Bootstrap in the background, then resync periodically. `get_db` returns the client or None."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(get_db), name="read-model-sync")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self, get_db):
+        while True:
+            db = await asyncio.to_thread(get_db)
+            if db is not None:
+                try:
+                    started = time.perf_counter()
+                    await self.sync(db)
+                    if not self.ready:
+                        self.ready = True
+                        logger.info(
+                            f"📚 Read model ready: {len(self.incidents)} incidents, {len(self.groups)} groups "
+                            f"in {time.perf_counter() - started:.1f}s"
+                        )
+                except Exception as e:
+                    logger.error(f"❌ Read model sync failed: {e}")
+            await asyncio.sleep(self.sync_seconds)
+
+    async def sync(self, db):
+        """Load every document newer than each table's watermark (everything on the first run)."""
+        for table in (self.incidents, self.groups):
+            await self._sync_table(db, table)
+        self.last_sync = time.time()
+
+    async def _sync_table(self, db, table):
+        table.watermark = await self._scan(db, table, table.sort_field, table.watermark)
+        if table.updated_field:
+            # Status changes keep the sort value, so they are found by their own timestamp
+            since = table.updated_watermark or table.watermark
+            table.updated_watermark = await self._scan(db, table, table.updated_field, since)
+
+    async def _scan(self, db, table, field, since):
+        """Upsert every document whose `field` is at or after `since` (rewound); returns the newest value seen."""
+        from google.cloud.firestore_v1.base_query import FieldFilter
+
+        query = db.collection(table.name)
+        if table.fields:
+            query = query.select(table.fields)
+        query = query.order_by(field)
+        if since:
+            query = query.where(filter=FieldFilter(field, ">=", _rewind(since)))
+        newest = since
+        last = None
+        while True:
+            page = query.start_after(last) if last is not None else query
+            docs = await page.limit(PAGE_SIZE).get()
+            for doc in docs:
+                data = doc.to_dict()
+                table.upsert(doc.id, data)
+                newest = max(newest, data.get(field) or "")
+            if len(docs) < PAGE_SIZE:
+                break
+            last = docs[-1]
+        return newest
+
+    def stats(self):
+        return {
+            "ready": self.ready,
+            "incidents": len(self.incidents),
+            "groups": len(self.groups),
+            "last_sync": self.last_sync,
+            "sync_seconds": self.sync_seconds,
+        }
+
+
+read_model = ReadModel()
@@ -0,0 +1,110 @@
+"""
+Lazy Service Registry
+
+The Firestore client is created on first use instead of as an import side
+effect, so the API process (and every worker fork) can start serving
+immediately. The "gemini" and "logging" entries only defer their heavy
+imports (httpx, google.cloud.logging); the Gemini client itself is a cheap
+module singleton and Cloud Logging clients are built per tenant by
+services.log_collector. `warm()` runs the factories in the background and
+`status()` backs the /ready endpoint.
+
+A factory that raises or returns None is not cached: the next get() after
+RETRY_SECONDS tries again, so a transient failure at startup heals itself.
+"""
+import time
+import threading
+
+from core.logger import get_logger
+
+logger = get_logger("registry")
+
+# Minimum gap between init attempts of a service that failed
+RETRY_SECONDS = 5.0
+
+
+class ServiceRegistry:
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._errors = {}
+        self._init_seconds = {}
+        self._locks = {}
+        self._failed_at = {}
+
+    def register(self, name, factory, required=True):
+        """Register a zero-argument factory. Required services gate readiness."""
+        self._factories[name] = (factory, required)
+        self._locks[name] = threading.Lock()
+
+    def get(self, name):
+        """Return the service, creating it on first use (thread-safe); None while it cannot be created."""
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        if time.monotonic() - self._failed_at.get(name, float("-inf")) < RETRY_SECONDS:
+            return None
+        with self._locks[name]:
+            if self._instances.get(name) is None and time.monotonic() - self._failed_at.get(name, float("-inf")) >= RETRY_SECONDS:
+                factory, _ = self._factories[name]
+                started = time.perf_counter()
+                try:
+                    instance = factory()
+                    if instance is None:
+                        raise RuntimeError("initializer returned None")
+                except Exception as e:
+                    logger.error(f"❌ Service '{name}' failed to initialize (retrying in {RETRY_SECONDS:.0f}s): {e}")
+                    self._errors[name] = str(e)
+                    self._failed_at[name] = time.monotonic()
+                else:
+                    self._instances[name] = instance
+                    self._errors.pop(name, None)
+                    self._failed_at.pop(name, None)
+                self._init_seconds[name] = time.perf_counter() - started
+        return self._instances.get(name)
+
+    def warm(self, names=None):
+        """Initialize services eagerly (call from a worker thread)."""
+        for name in names or list(self._factories):
+            self.get(name)
+
+    def is_ready(self):
+        return all(
+            self._instances.get(name) is not None
+            for name, (_, required) in self._factories.items()
+            if required
+        )
+
+    def status(self):
+        return {
+            name: {
+                "initialized": name in self._init_seconds,
+                "available": self._instances.get(name) is not None,
+                "required": required,
+                "init_ms": round(self._init_seconds[name] * 1000, 1) if name in self._init_seconds else None,
+                "error": self._errors.get(name),
+            }
+            for name, (_, required) in self._factories.items()
+        }
+
+
+def _init_db():
+    from core.agent import init_firebase
+    return init_firebase()
+
+
+def _init_gemini():
+    import httpx  # noqa: F401 - warm the HTTP stack used by the Gemini client
+    from core.gemini_client import gemini_client
+    return gemini_client
+
+
+def _init_logging():
+    from google.cloud import logging_v2
+    return logging_v2
+
+
+registry = ServiceRegistry()
+registry.register("db", _init_db)
+registry.register("gemini", _init_gemini)
+registry.register("logging", _init_logging, required=False)
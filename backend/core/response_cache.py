@@ -0,0 +1,160 @@
+"""
+Response Cache with ETag / 304 for Dashboard Read Endpoints
+
+The dashboard polls a handful of GET routes. Their responses are cached
+per (path, query string) for a short TTL and tagged with a content hash
+ETag; a poll carrying a matching If-None-Match gets an empty 304.
+
+Entries also record the version of the data they were built from.
+Incident and group writes bump those versions through core.events, so a
+write in this process invalidates immediately; writes made by other
+instances show up once the TTL lapses. Concurrent misses for the same
+key share one upstream call, so Firestore reads scale with the write
+rate rather than with the number of viewers.
+"""
+import os
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict, defaultdict
+
+from core.events import bus, INCIDENT_CREATED, INCIDENT_UPDATED, GROUP_UPSERTED
+from core.metrics import metrics
+
+# path -> (ttl seconds, data the response depends on)
+CACHED_ROUTES = {
+    "/analytics/summary": (10.0, ("incidents",)),
+    "/analytics/trends": (30.0, ("incidents",)),
+    "/groups": (5.0, ("groups",)),
+    "/incidents": (5.0, ("incidents",)),
+    "/groups/{id}": (10.0, ("groups",)),
+}
+MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+# Clients always revalidate, which is what makes If-None-Match polls cheap
+CACHE_CONTROL = "no-cache"
+
+CACHE_REQUESTS = metrics.counter("rca_response_cache_total", "Cached route requests by outcome", ("route", "result"))
+
+versions = defaultdict(int)
+
+
+def bump(*topics):
+    for topic in topics:
+        versions[topic] += 1
+
+
+bus.subscribe(INCIDENT_CREATED, lambda _: bump("incidents"))
+bus.subscribe(INCIDENT_UPDATED, lambda _: bump("incidents"))
+bus.subscribe(GROUP_UPSERTED, lambda _: bump("groups"))
+
+
+def _route_for(path):
+    """Map a request path to its CACHED_ROUTES entry (detail paths share one template)."""
+    if path in CACHED_ROUTES:
+        return path
+    parts = path.strip("/").split("/")
+    if len(parts) == 2 and parts[0] == "groups":
+        return "/groups/{id}"
+    return None
+
+
+def _etag(body):
+    # Weak: the same entity may go out gzip-encoded or not (GZipMiddleware sits outside this cache)
+    return 'W/"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def _etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+
+class ResponseCache:
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> {"body", "headers", "etag", "version", "expires"}
+        self._inflight = {}
+
+    def get(self, key, version):
+        entry = self._entries.get(key)
+        if entry is None or entry["version"] != version or entry["expires"] < time.monotonic():
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return {"entries": len(self._entries), "inflight": len(self._inflight), "versions": dict(versions)}
+
+
+response_cache = ResponseCache()
+
+
+def install_response_cache(app):
+    """Attach the caching middleware unless RESPONSE_CACHE_ENABLED=false.
+
+    Install it before CORSMiddleware so CORS headers are still added per
+    request on top of cached responses.
+    """
+    if os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "false":
+        return False
+
+    from starlette.responses import Response
+
+    def _respond(request, route, entry, result):
+        if _etag_matches(request.headers.get("if-none-match"), entry["etag"]):
+            CACHE_REQUESTS.inc(route=route, result="not_modified")
+            return Response(status_code=304, headers={"ETag": entry["etag"], "Cache-Control": CACHE_CONTROL})
+        CACHE_REQUESTS.inc(route=route, result=result)
+        return Response(content=entry["body"], status_code=200, headers=entry["headers"])
+
+    @app.middleware("http")
+    async def cache_response(request, call_next):
+        route = _route_for(request.url.path)
+        if request.method != "GET" or route is None:
+            return await call_next(request)
+
+        ttl, depends = CACHED_ROUTES[route]
+        key = (request.url.path, str(request.query_params))
+        version = tuple(versions[topic] for topic in depends)
+
+        entry = response_cache.get(key, version)
+        if entry is not None:
+            return _respond(request, route, entry, "hit")
+
+        leader = response_cache._inflight.get(key)
+        if leader is not None:
+            # Another request is already fetching this key: share its result
+            entry = await asyncio.shield(leader)
+            if entry is not None:
+                return _respond(request, route, entry, "shared")
+            return await call_next(request)
+
+        future = asyncio.get_running_loop().create_future()
+        response_cache._inflight[key] = future
+        entry = None
+        try:
+            response = await call_next(request)
+            if response.status_code != 200:
+                return response
+            body = b"".join([chunk async for chunk in response.body_iterator])
+            headers = {k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+            etag = _etag(body)
+            headers.update({"ETag": etag, "Cache-Control": CACHE_CONTROL})
+            entry = {"body": body, "headers": headers, "etag": etag, "version": version, "expires": time.monotonic() + ttl}
+            response_cache.put(key, entry)
+            return _respond(request, route, entry, "miss")
+        finally:
+            del response_cache._inflight[key]
+            future.set_result(entry)
+
+    return True
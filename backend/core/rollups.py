@@ -0,0 +1,451 @@
+"""
+Incrementally Maintained Analytics Rollups
+
+Dashboard aggregates are updated as incidents are written (and when their
+status changes) instead of being recomputed from the incidents
+collection on every refresh:
+
+- analytics/summary: open and critical-open counters, per-hour incident
+  counts (for the 24h total), per-service last-seen times and running
+  confidence sums. /analytics/summary is one document read.
+- analytics_buckets/hour_YYYYMMDDHH and day_YYYYMMDD: errors, anomalies,
+  per-service error counts and status distribution per time bucket. Day
+  buckets also keep a bottom-k hash sample of incidents (a uniform
+  sample that merges across days) for the risk matrix.
+  /analytics/trends reads one document per bucket in the range.
+
+Deltas accumulate in memory and are flushed every ROLLUP_FLUSH_SECONDS
+as one batched merge write with server-side increments, so instances
+never contend on a read-modify-write of the same document and a burst
+of incidents costs one write. Unflushed local deltas are folded into
+reads, so this process always sees its own writes.
+
+Run `python utils/rebuild_rollups.py` once to backfill from existing
+incidents (and to reconcile after any drift).
+"""
+import os
+import zlib
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from core.metrics import metrics
+from core.logger import get_logger
+
+logger = get_logger("rollups")
+
+CRITICAL_PRIORITIES = ("P0", "P1", "P0 (Auto-Escalated)")
+ROLLUP_COLLECTION = "analytics"
+SUMMARY_DOC = "summary"
+BUCKET_COLLECTION = "analytics_buckets"
+SAMPLE_SIZE = int(os.getenv("ROLLUP_SAMPLE_SIZE", "30"))
+FLUSH_SECONDS = float(os.getenv("ROLLUP_FLUSH_SECONDS", "5"))
+HOURLY_RETENTION = timedelta(hours=48)
+SCAN_PAGE_SIZE = 1000
+FIRESTORE_BATCH_LIMIT = 500
+# Incident fields the rollups read; the rebuild scan fetches nothing else (no log context)
+ROLLUP_FIELDS = [
+    "timestamp", "service_name", "status", "priority", "occurrence_count", "analysis.confidence", "analysis.cause"
+]
+
+ROLLUP_FLUSHES = metrics.counter("rca_rollup_flushes_total", "Rollup delta flushes by result", ("result",))
+
+
+def _parse_ts(value):
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _hour_key(ts):
+    return "h" + ts.strftime("%Y%m%d%H")
+
+
+def _hour_bucket(ts):
+    return "hour_" + ts.strftime("%Y%m%d%H")
+
+
+def _day_bucket(ts):
+    return "day_" + ts.strftime("%Y%m%d")
+
+
+def _sample_hash(incident_id):
+    return zlib.crc32(incident_id.encode()) / 2**32
+
+
+def _keep_smallest(entries):
+    unique = {entry["id"]: entry for entry in entries}
+    return sorted(unique.values(), key=lambda entry: entry["h"])[:SAMPLE_SIZE]
+
+
+def _confidence(data):
+    confidence = (data.get("analysis") or {}).get("confidence", 0)
+    if not isinstance(confidence, (int, float)):
+        return 0
+    if 0 < confidence <= 1.0:
+        confidence = round(confidence * 100)
+    return confidence
+
+
+class _Latest:
+    """Delta leaf that overwrites (keeping the newest value) instead of incrementing."""
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+
+def _add(tree, path, value):
+    node = tree
+    for key in path[:-1]:
+        node = node.setdefault(key, {})
+    leaf = path[-1]
+    if isinstance(value, _Latest):
+        current = node.get(leaf)
+        if current is None or value.value > current.value:
+            node[leaf] = value
+    else:
+        node[leaf] = node.get(leaf, 0) + value
+
+
+def _merge(tree, delta):
+    """Fold one delta tree into another (used to requeue a failed flush)."""
+    for key, value in delta.items():
+        if isinstance(value, dict):
+            _merge(tree.setdefault(key, {}), value)
+        else:
+            _add(tree, (key,), value)
+
+
+def _apply(doc, delta):
+    """Apply a delta tree to a plain document dict (read path)."""
+    for key, value in delta.items():
+        if isinstance(value, dict):
+            _apply(doc.setdefault(key, {}), value)
+        elif isinstance(value, _Latest):
+            if not doc.get(key) or value.value > doc[key]:
+                doc[key] = value.value
+        else:
+            doc[key] = doc.get(key, 0) + value
+
+
+def _to_firestore(delta):
+    from google.cloud import firestore
+
+    out = {}
+    for key, value in delta.items():
+        if isinstance(value, dict):
+            out[key] = _to_firestore(value)
+        elif isinstance(value, _Latest):
+            out[key] = value.value
+        elif value:
+            out[key] = firestore.Increment(value)
+    return out
+
+
+def _plain(delta):
+    """Delta tree -> literal values (full rebuilds write absolute numbers, not increments)."""
+    return {
+        key: _plain(value) if isinstance(value, dict) else value.value if isinstance(value, _Latest) else value
+        for key, value in delta.items()
+    }
+
+
+def _summary_delta(tree, data, now):
+    ts = _parse_ts(data.get("timestamp")) or now
+    _add(tree, ("total",), 1)
+    if now - ts <= HOURLY_RETENTION:
+        _add(tree, ("hourly", _hour_key(ts)), 1)
+    if data.get("service_name"):
+        _add(tree, ("services", data["service_name"]), _Latest(data.get("timestamp") or now.isoformat()))
+    confidence = _confidence(data)
+    if confidence > 0:
+        _add(tree, ("confidence_sum",), confidence)
+        _add(tree, ("confidence_count",), 1)
+    _status_delta(tree, data.get("status", "OPEN"), data.get("priority"), 1)
+
+
+def _bucket_deltas(trees, data, now):
+    """Add one incident to its hourly and daily bucket deltas."""
+    ts = _parse_ts(data.get("timestamp")) or now
+    errors = data.get("occurrence_count", 1)
+    service = data.get("service_name", "Unknown")
+    status = data.get("status", "OPEN")
+    for doc_id, start in (
+        (_hour_bucket(ts), ts.replace(minute=0, second=0, microsecond=0)),
+        (_day_bucket(ts), ts.replace(hour=0, minute=0, second=0, microsecond=0)),
+    ):
+        tree = trees[(BUCKET_COLLECTION, doc_id)]
+        _add(tree, ("start",), _Latest(start.isoformat()))
+        _add(tree, ("errors",), errors)
+        _add(tree, ("anomalies",), 1)
+        _add(tree, ("services", service), errors)
+        _add(tree, ("status", status), 1)
+    return ts
+
+
+def _sample_entry(incident_id, data):
+    analysis = data.get("analysis") or {}
+    return {
+        "id": incident_id,
+        "h": _sample_hash(incident_id),
+        "ts": data.get("timestamp"),
+        "confidence": _confidence(data),
+        "impact": data.get("occurrence_count", 1),
+        "service": data.get("service_name", "Unknown"),
+        "label": analysis.get("cause", "Unknown"),
+    }
+
+
+def _status_delta(tree, status, priority, sign):
+    if status == "OPEN":
+        _add(tree, ("open",), sign)
+        if priority in CRITICAL_PRIORITIES:
+            _add(tree, ("critical_open",), sign)
+
+
+class AnalyticsRollups:
+    def __init__(self, flush_interval=FLUSH_SECONDS):
+        self.flush_interval = flush_interval
+        self._pending = defaultdict(dict)  # (collection, doc_id) -> delta tree
+        self._stale_hours = set()
+        self._candidates = defaultdict(list)  # day bucket -> sample candidates not yet written
+        self._thresholds = {}  # day bucket -> largest hash in its (full) sample
+        self._db = None
+        self._flush_task = None
+
+    # --- write side ---
+    def record_incident(self, db, incident_id, data):
+        """Account for a newly stored incident (call right after the Firestore write)."""
+        now = datetime.now()
+        _summary_delta(self._pending[(ROLLUP_COLLECTION, SUMMARY_DOC)], data, now)
+        ts = _bucket_deltas(self._pending, data, now)
+
+        # Only incidents that could enter the day's bottom-k sample cost a (transactional) write
+        day = _day_bucket(ts)
+        entry = _sample_entry(incident_id, data)
+        if entry["h"] < self._thresholds.get(day, 1.0):
+            self._candidates[day].append(entry)
+        self._schedule(db)
+
+    def record_status_change(self, db, data, old_status, new_status):
+        """Move an incident (needs its timestamp and priority) between statuses in every rollup."""
+        if old_status == new_status:
+            return
+        tree = self._pending[(ROLLUP_COLLECTION, SUMMARY_DOC)]
+        _status_delta(tree, old_status, data.get("priority"), -1)
+        _status_delta(tree, new_status, data.get("priority"), 1)
+        ts = _parse_ts(data.get("timestamp"))
+        if ts:
+            for doc_id in (_hour_bucket(ts), _day_bucket(ts)):
+                bucket = self._pending[(BUCKET_COLLECTION, doc_id)]
+                _add(bucket, ("status", old_status or "OPEN"), -1)
+                _add(bucket, ("status", new_status), 1)
+        self._schedule(db)
+
+    def _schedule(self, db):
+        self._db = db
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop(), name="rollup-flush")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self):
+        """Write pending deltas in one batch of server-side increments, then the risk-matrix samples."""
+        if self._db is None:
+            return
+        if (self._pending or self._stale_hours) and not await self._flush_counters():
+            return
+        if self._candidates:
+            # Also retries candidates requeued by a failed sample transaction
+            await self._flush_samples()
+
+    async def _flush_counters(self):
+        """Commit pending deltas and stale-hour deletes; False (with everything requeued) on failure."""
+        from google.cloud import firestore
+
+        pending, self._pending = self._pending, defaultdict(dict)
+        stale, self._stale_hours = self._stale_hours, set()
+        try:
+            batch = self._db.batch()
+            for (collection, doc_id), delta in pending.items():
+                batch.set(self._db.collection(collection).document(doc_id), _to_firestore(delta), merge=True)
+            if stale:
+                batch.update(
+                    self._db.collection(ROLLUP_COLLECTION).document(SUMMARY_DOC),
+                    {f"hourly.{key}": firestore.DELETE_FIELD for key in stale}
+                )
+            await batch.commit()
+            ROLLUP_FLUSHES.inc(result="ok")
+        except Exception as e:
+            # Requeue so the next flush retries; counters only ever move through increments
+            for key, delta in pending.items():
+                _merge(self._pending[key], delta)
+            self._stale_hours |= stale
+            ROLLUP_FLUSHES.inc(result="error")
+            logger.warning(f"⚠️ Rollup flush failed ({len(pending)} docs requeued): {e}")
+            return False
+        return True
+
+    async def _flush_samples(self):
+        from google.cloud.firestore import async_transactional
+
+        @async_transactional
+        async def admit(transaction, ref, candidates):
+            snapshot = await ref.get(transaction=transaction)
+            sample = (snapshot.to_dict() or {}).get("sample", []) if snapshot.exists else []
+            kept = _keep_smallest(sample + candidates)
+            transaction.set(ref, {"sample": kept}, merge=True)
+            return kept
+
+        candidates, self._candidates = self._candidates, defaultdict(list)
+        oldest_day = _day_bucket(datetime.now() - timedelta(days=31))
+        self._thresholds = {day: h for day, h in self._thresholds.items() if day >= oldest_day}
+        for day, entries in candidates.items():
+            try:
+                ref = self._db.collection(BUCKET_COLLECTION).document(day)
+                kept = await admit(self._db.transaction(), ref, _keep_smallest(entries))
+                if len(kept) >= SAMPLE_SIZE:
+                    self._thresholds[day] = kept[-1]["h"]
+            except Exception as e:
+                self._candidates[day].extend(entries)
+                logger.warning(f"⚠️ Risk-matrix sample update failed for {day}: {e}")
+
+    async def stop(self):
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+    # --- read side ---
+    async def _read(self, db, doc_id):
+        doc = await db.collection(ROLLUP_COLLECTION).document(doc_id).get()
+        data = doc.to_dict() if doc.exists else {}
+        _apply(data, self._pending.get((ROLLUP_COLLECTION, doc_id), {}))
+        return data
+
+    async def summary(self, db):
+        data = await self._read(db, SUMMARY_DOC)
+        now = datetime.now()
+
+        hourly = data.get("hourly", {})
+        last_24h = {_hour_key(now - timedelta(hours=i)) for i in range(24)}
+        oldest_kept = _hour_key(now - HOURLY_RETENTION)
+        self._stale_hours |= {key for key in hourly if key < oldest_kept}
+        if self._stale_hours:
+            self._schedule(db)
+
+        day_ago = (now - timedelta(hours=24)).isoformat()
+        active_count = max(0, data.get("open", 0))
+        critical_count = max(0, data.get("critical_open", 0))
+        confidence_count = data.get("confidence_count", 0)
+        return {
+            "totalErrors": sum(count for key, count in hourly.items() if key in last_24h),
+            "activeGroups": active_count,
+            "criticalIssues": critical_count,
+            # Health Score Logic: 100 - (active_count * 2) - (critical_count * 10)
+            "healthScore": max(0, 100 - (active_count * 2) - (critical_count * 10)),
+            "avgConfidence": round(data.get("confidence_sum", 0) / confidence_count) if confidence_count else 0,
+            "impactedServices": sum(1 for seen in data.get("services", {}).values() if seen and seen >= day_ago),
+        }
+
+    async def trends(self, db, range_="7d"):
+        """Trend, service, status and risk-matrix data from O(buckets) documents."""
+        now = datetime.now()
+        if range_ == "24h":
+            starts = [now - timedelta(hours=i) for i in range(23, -1, -1)]
+            bucket_ids = [_hour_bucket(ts) for ts in starts]
+            label = "%H:00"
+            threshold = (now - timedelta(hours=24)).isoformat()
+        else:
+            days = 30 if range_ == "30d" else 7
+            starts = [now - timedelta(days=i) for i in range(days - 1, -1, -1)]
+            bucket_ids = [_day_bucket(ts) for ts in starts]
+            label = "%b %d"
+            threshold = (now - timedelta(days=days)).isoformat()
+        # The risk-matrix sample lives in the day buckets
+        sample_ids = sorted({_day_bucket(ts) for ts in starts})
+
+        refs = [db.collection(BUCKET_COLLECTION).document(doc_id) for doc_id in dict.fromkeys(bucket_ids + sample_ids)]
+        docs = {}
+        async for snapshot in db.get_all(refs):
+            docs[snapshot.id] = snapshot.to_dict() if snapshot.exists else {}
+        for doc_id, data in docs.items():
+            _apply(data, self._pending.get((BUCKET_COLLECTION, doc_id), {}))
+
+        trends = []
+        services = defaultdict(int)
+        status_dist = {"OPEN": 0, "RESOLVED": 0, "INVESTIGATING": 0}
+        # Buckets are walked in time order, so the series is chronological (not sorted by label)
+        for doc_id, start in zip(bucket_ids, starts):
+            data = docs.get(doc_id, {})
+            if not data.get("anomalies"):
+                continue
+            trends.append({"date": start.strftime(label), "errors": data.get("errors", 0), "anomalies": data["anomalies"]})
+            for svc, count in data.get("services", {}).items():
+                services[svc] += count
+            for status, count in data.get("status", {}).items():
+                status_dist[status] = status_dist.get(status, 0) + count
+
+        samples = []
+        for doc_id in sample_ids:
+            samples.extend(docs.get(doc_id, {}).get("sample", []))
+            samples.extend(self._candidates.get(doc_id, []))
+        risk_matrix = [
+            {
+                "confidence": entry.get("confidence", 0),
+                "impact": entry.get("impact", 1),
+                "service": entry.get("service", "Unknown"),
+                "label": entry.get("label", "Unknown"),
+                "id": entry["id"][:8],
+            }
+            for entry in _keep_smallest(e for e in samples if (e.get("ts") or "") >= threshold)
+        ]
+
+        top_categories = sorted(({"name": k, "value": v} for k, v in services.items()), key=lambda x: x["value"], reverse=True)[:5]
+        return {
+            "trends": trends,
+            "topCategories": top_categories,
+            "statusDistribution": [{"name": k.capitalize(), "value": max(0, v)} for k, v in status_dist.items()],
+            "riskMatrix": risk_matrix,
+        }
+
+    # --- backfill ---
+    async def rebuild(self, db):
+        """Recompute every rollup document from the incidents collection (overwrites them)."""
+        now = datetime.now()
+        trees = defaultdict(dict)
+        samples = defaultdict(list)
+        incidents = 0
+        query = db.collection("incidents").select(ROLLUP_FIELDS).order_by("timestamp")
+        last = None
+        while True:
+            page = query.start_after(last) if last is not None else query
+            docs = await page.limit(SCAN_PAGE_SIZE).get()
+            for doc in docs:
+                data = doc.to_dict()
+                _summary_delta(trees[(ROLLUP_COLLECTION, SUMMARY_DOC)], data, now)
+                ts = _bucket_deltas(trees, data, now)
+                samples[_day_bucket(ts)].append(_sample_entry(doc.id, data))
+                incidents += 1
+            if len(docs) < SCAN_PAGE_SIZE:
+                break
+            last = docs[-1]
+
+        trees.setdefault((ROLLUP_COLLECTION, SUMMARY_DOC), {})
+        for day, entries in samples.items():
+            trees[(BUCKET_COLLECTION, day)]["sample"] = _keep_smallest(entries)
+        items = list(trees.items())
+        for i in range(0, len(items), FIRESTORE_BATCH_LIMIT):
+            batch = db.batch()
+            for (collection, doc_id), tree in items[i:i + FIRESTORE_BATCH_LIMIT]:
+                batch.set(db.collection(collection).document(doc_id), _plain(tree))
+            await batch.commit()
+        return {"incidents": incidents, "documents": len(trees)}
+
+
+analytics_rollups = AnalyticsRollups()
@@ -0,0 +1,40 @@
+"""
+Fast JSON Responses
+
+FastJSONResponse renders with orjson when it is installed (stdlib json
+otherwise) and is the app's default response class. The heavy read
+routes declare a Pydantic response_model for the OpenAPI schema but
+return a FastJSONResponse themselves: their payloads are built by our
+own code, so FastAPI's validation and jsonable_encoder passes would be
+pure overhead. `python utils/bench_serialization.py` compares both paths.
+"""
+import json
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+
+def _default(obj):
+    """Fallback for values neither encoder handles natively (Firestore timestamps, sets, models)."""
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    return str(obj)
+
+
+def dumps(content):
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content):
+        return dumps(content)
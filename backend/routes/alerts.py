@@ -1,15 +1,12 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-import sys
-import os
+from typing import Optional
 
-# Add parent directory to path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.registry import registry
+from core.events import bus, ALERT_RULES_CHANGED
+from core.logger import get_logger
 
-try:
-    from core.agent import db
-except ImportError:
-    db = None
+logger = get_logger("routes.alerts")
 
 router = APIRouter(prefix="/alerts", tags=["Alerts"])
 
@@ -20,8 +17,11 @@ class AlertRule(BaseModel):
     window_minutes: int
     severity: str
     enabled: bool = True
+    # Minutes to stay quiet after firing; defaults to window_minutes, 0 disables
+    cooldown_minutes: Optional[int] = None
 
 def get_db():
+    db = registry.get("db")
     if db is None:
         raise HTTPException(status_code=503, detail="Firebase is not initialized.")
     return db
@@ -44,9 +44,10 @@ async def create_alert_rule(rule: AlertRule):
         # Use model_dump() in Pydantic v2 or dict() in v1
         rule_data = rule.dict()
         doc_ref = await conn.collection("alert_rules").add(rule_data)
+        bus.publish(ALERT_RULES_CHANGED, {"id": doc_ref[1].id})
         return {"status": "created", "id": doc_ref[1].id}
     except Exception as e:
-        print(f"❌ Error creating alert rule: {e}")
+        logger.error(f"❌ Error creating alert rule: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/rules/{rule_id}")
@@ -55,6 +56,7 @@ async def update_alert_rule(rule_id: str, rule: AlertRule):
     conn = get_db()
     try:
         await conn.collection("alert_rules").document(rule_id).update(rule.dict())
+        bus.publish(ALERT_RULES_CHANGED, {"id": rule_id})
         return {"status": "updated"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -65,6 +67,7 @@ async def delete_alert_rule(rule_id: str):
     conn = get_db()
     try:
         await conn.collection("alert_rules").document(rule_id).delete()
+        bus.publish(ALERT_RULES_CHANGED, {"id": rule_id})
         return {"status": "deleted"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
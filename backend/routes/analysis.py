@@ -1,19 +1,22 @@
-from fastapi import APIRouter, HTTPException, Header
+from fastapi import APIRouter, HTTPException, Header, Request
 from pydantic import BaseModel
 from typing import Optional
-import sys
-import os
-import base64
-import json
-
-# Add parent directory to path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 try:
     from core.agent import run_analysis_for_api
 except ImportError:
     run_analysis_for_api = None
 
+from core.admin import is_admin, get_user_id
+from core.fair_share import gemini_scheduler, logging_scheduler
+from core.gemini_client import gemini_client
+from core.fast_path import fast_path
+from services.credential_manager import credential_cache
+from services.log_collector import logging_client_pool
+from core.logger import get_logger
+
+logger = get_logger("routes.analysis")
+
 router = APIRouter(prefix="/analyze", tags=["Analysis"])
 
 class AnalyzeRequest(BaseModel):
@@ -24,18 +27,11 @@ class AnalyzeRequest(BaseModel):
 @router.post("/start")
 async def analyze_start(request: AnalyzeRequest, authorization: str = Header(None)):
     """Triggers the full Gemini-3 AI analysis pipeline."""
-    print(f"📥 Received API Request: Lookback {request.time_range_minutes}m")
+    logger.info(f"📥 Received API Request: Lookback {request.time_range_minutes}m")
     
-    # Extract user_id from authorization header
-    user_id = "default_user"  # fallback
-    if authorization and authorization.startswith('Bearer '):
-        try:
-            token = authorization.replace('Bearer ', '')
-            user_data = json.loads(base64.b64decode(token))
-            user_id = user_data.get('user_id', 'default_user')
-            print(f"👤 Analysis requested by user: {user_id}")
-        except Exception as e:
-            print(f"⚠️ Failed to decode user token: {e}")
+    # Extract user_id from authorization header (falls back to default_user)
+    user_id = get_user_id(authorization)
+    logger.info(f"👤 Analysis requested by user: {user_id}")
     
     try:
         if run_analysis_for_api is None:
@@ -48,10 +44,24 @@ async def analyze_start(request: AnalyzeRequest, authorization: str = Header(Non
         )
         return result
     except Exception as e:
-        print(f"❌ API Endpoint Error: {str(e)}")
+        logger.error(f"❌ API Endpoint Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/status/{task_id}")
 async def analyze_status(task_id: str):
     """Get status of an analysis task"""
     return {"status": "completed", "progress": 100}
+
+@router.get("/queue")
+async def analyze_queue_stats(request: Request):
+    """Per-tenant queue wait, Gemini client health, fast-path coverage and credential cache (admin only: keyed by user id)"""
+    if not is_admin(request.headers):
+        raise HTTPException(status_code=403, detail="Admin access required.")
+    return {
+        "gemini": gemini_scheduler.stats(),
+        "logging": logging_scheduler.stats(),
+        "gemini_client": gemini_client.stats(),
+        "fast_path": fast_path.stats(),
+        "credentials": credential_cache.stats(),
+        "logging_clients": logging_client_pool.stats()
+    }
@@ -3,23 +3,16 @@ from fastapi.responses import RedirectResponse
 from typing import Optional
 import json
 import base64
+import asyncio
 import secrets
 from pydantic import BaseModel
 from google_auth_oauthlib.flow import Flow
 from google.oauth2.credentials import Credentials
 from firebase_admin import firestore
 import os
-import sys
 
-# Add parent directory to path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-try:
-    from core.agent import db
-    from services.credential_manager import store_credentials
-except ImportError as e:
-    print(f"Import error: {e}")
-    db = None
+from core.registry import registry
+from services.credential_manager import store_credentials
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -164,6 +157,7 @@ async def google_callback(
         print(f"⚠️ Failed to decode state: {e}")
         
     try:
+        db = registry.get("db")
         if db is None:
             raise HTTPException(status_code=503, detail="Firebase not initialized")
         
@@ -175,8 +169,8 @@ async def google_callback(
             state=state
         )
         
-        # Exchange authorization code for tokens
-        flow.fetch_token(code=code)
+        # Exchange authorization code for tokens (blocking HTTP, run off the event loop)
+        await asyncio.to_thread(flow.fetch_token, code=code)
         credentials = flow.credentials
         
         # Extract user info from ID token or userinfo endpoint
@@ -192,7 +186,8 @@ async def google_callback(
             # Try to get info from ID token first
             if credentials.id_token:
                 request = google.auth.transport.requests.Request()
-                id_info = id_token.verify_oauth2_token(
+                id_info = await asyncio.to_thread(
+                    id_token.verify_oauth2_token,
                     credentials.id_token,
                     request,
                     credentials.client_id
@@ -206,7 +201,7 @@ async def google_callback(
                 print(f"⚠️ No ID token, using userinfo endpoint")
                 userinfo_url = 'https://www.googleapis.com/oauth2/v2/userinfo'
                 headers = {'Authorization': f'Bearer {credentials.token}'}
-                response = http_requests.get(userinfo_url, headers=headers)
+                response = await asyncio.to_thread(http_requests.get, userinfo_url, headers=headers)
                 
                 if response.status_code == 200:
                     userinfo = response.json()
@@ -263,6 +258,7 @@ async def google_callback(
 async def google_auth_status(user_id: str = "default_user"):
     """Check if user has valid Google credentials"""
     try:
+        db = registry.get("db")
         if db is None:
             return {"authenticated": False, "error": "Firebase not initialized"}
         
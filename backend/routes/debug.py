@@ -0,0 +1,33 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse
+
+from core.admin import is_admin
+from core.profiling import list_profiles, profile_path
+from core.loop_monitor import loop_monitor
+
+router = APIRouter(prefix="/debug", tags=["Debug"])
+
+def require_admin(request: Request):
+    if not is_admin(request.headers):
+        raise HTTPException(status_code=403, detail="Admin access required.")
+
+@router.get("/profiles")
+async def get_profiles(request: Request):
+    """List saved per-request profiles (newest first)"""
+    require_admin(request)
+    return {"profiles": list_profiles()}
+
+@router.get("/profiles/{name}")
+async def download_profile(name: str, request: Request):
+    """Download a profile artifact (.folded, .tasks.json, .prof or .txt)"""
+    require_admin(request)
+    path = profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=name)
+
+@router.get("/loop")
+async def get_loop_health(request: Request):
+    """Event-loop lag and stack traces of recent blocking stalls"""
+    require_admin(request)
+    return loop_monitor.stats()
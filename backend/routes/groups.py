@@ -1,93 +1,164 @@
 from fastapi import APIRouter, HTTPException
-from typing import Optional
+from pydantic import BaseModel, ConfigDict
+from typing import Any, Optional
 from google.cloud.firestore_v1.base_query import FieldFilter
-import sys
-import os
 
-# Add parent directory to path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.registry import registry
+from core.read_model import read_model
+from core.incident_store import GROUP_DETAIL_FIELDS, load_log_context, log_context_ref
+from core.pagination import CURSOR_HEADER, encode_cursor, decode_cursor, clamp_limit, keyset_page
+from core.serialization import FastJSONResponse
+from core.logger import get_logger
 
-try:
-    from core.agent import db
-except ImportError:
-    db = None
+logger = get_logger("routes.groups")
 
 router = APIRouter(prefix="/groups", tags=["Groups"])
 
 def get_db():
+    db = registry.get("db")
     if db is None:
         raise HTTPException(status_code=503, detail="Firebase is not initialized.")
     return db
 
-@router.get("")
+# Response schemas (documented in OpenAPI; the routes return pre-rendered FastJSONResponses)
+class GroupItem(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    id: str
+    name: Optional[str] = None
+    category: Optional[str] = None
+    status: Optional[str] = None
+    severity: Optional[str] = None
+    count: int = 0
+    first_seen: Optional[str] = None
+    last_seen: Optional[str] = None
+    services: list[str] = []
+
+class RootCause(BaseModel):
+    cause: Optional[str] = None
+    confidence: Optional[float] = None
+    evidence: list[str] = []
+
+class GroupDetail(BaseModel):
+    id: str
+    name: str
+    status: str
+    severity: str
+    summary: Optional[str] = None
+    count: int
+    first_seen: Optional[str] = None
+    service_name: Optional[str] = None
+    root_cause: RootCause
+    analysis: dict[str, Any] = {}
+    logs: list[Any] = []
+
+@router.get("", response_model=list[GroupItem])
 async def list_groups(
     status: Optional[str] = None, 
     category: Optional[str] = None,
     page: int = 1, 
-    limit: int = 10
+    limit: int = 10,
+    cursor: Optional[str] = None
 ):
-    conn = get_db()
+    """List groups newest-first. Pass the X-Next-Cursor response header back as `cursor` for the next page."""
     try:
-        from google.cloud.firestore import Query
-        
-        # Start with base query - only order by last_seen
-        # We perform in-memory filtering to avoid requiring composite indexes
-        # which would block evaluators.
-        query = conn.collection("groups").order_by("last_seen", direction=Query.DESCENDING)
-        
-        # Fetch a larger batch for in-memory filtering
-        docs = await query.limit(200).get()
-        
-        all_groups = []
-        for doc in docs:
-            data = doc.to_dict()
-            
-            # Apply In-Memory Filters
-            if status and status != 'ALL' and data.get("status") != status:
-                continue
-            
-            if category and category != 'ALL' and data.get("category") != category:
-                continue
-                
-            all_groups.append(data)
-            
-        # Pagination
-        start = (page - 1) * limit
-        end = start + limit
-        return all_groups[start:end]
-    except Exception as e:
-        print(f"Error fetching groups: {e}")
-        return []
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    limit = clamp_limit(limit)
+    offset = 0 if after else (max(page, 1) - 1) * limit
+    filters = {
+        "status": status if status and status != 'ALL' else None,
+        "category": category if category and category != 'ALL' else None,
+    }
+
+    if read_model.ready:
+        # Served from the in-memory read model: exact at any depth, no Firestore reads
+        groups = read_model.groups.query(filters, limit=limit, offset=offset, after=after)
+    else:
+        # Fallback until the read model has bootstrapped
+        conn = get_db()
+        try:
+            docs = await keyset_page(conn.collection("groups"), "last_seen", filters, limit, after=after, offset=offset)
+            groups = [
+                {**{k: v for k, v in doc.to_dict().items() if k not in GROUP_DETAIL_FIELDS}, "id": doc.id}
+                for doc in docs
+            ]
+        except Exception as e:
+            logger.error(f"Error fetching groups: {e}")
+            return FastJSONResponse([])
+
+    headers = {}
+    if len(groups) == limit:
+        headers[CURSOR_HEADER] = encode_cursor(groups[-1].get("last_seen"), groups[-1]["id"])
+    return FastJSONResponse(groups, headers=headers)
 
-@router.get("/{group_id}")
+def _group_detail(group_id, name, status, severity, count, first_seen, service_name, analysis, logs):
+    confidence = analysis.get("confidence", 0)
+    return FastJSONResponse({
+        "id": group_id,
+        "name": name,
+        "status": status,
+        "severity": severity,
+        "summary": analysis.get("cause"),
+        "count": count,
+        "first_seen": first_seen,
+        "service_name": service_name,
+        "root_cause": {
+            "cause": analysis.get("cause"),
+            "confidence": round(confidence * 100) if confidence <= 1.0 else confidence,
+            "evidence": [analysis.get("correlation_insight", "")]
+        },
+        "analysis": analysis,
+        "logs": logs
+    })
+
+@router.get("/{group_id}", response_model=GroupDetail)
 async def get_group_detail(group_id: str):
     """Get detailed information about a specific group"""
     conn = get_db()
     try:
+        # The group doc carries the latest analysis; fetch it and its log context in one batched read
+        group_ref = conn.collection("groups").document(group_id)
+        logs_ref = log_context_ref(group_ref)
+        snapshots = {snap.reference.path: snap async for snap in conn.get_all([group_ref, logs_ref])}
+        group_doc = snapshots.get(group_ref.path)
+        data = group_doc.to_dict() if group_doc is not None and group_doc.exists else None
+
+        if data and "latest_analysis" in data:
+            logs_doc = snapshots.get(logs_ref.path)
+            return _group_detail(
+                group_id,
+                name=data.get("name", "Unknown Anomaly"),
+                status=data.get("status", "OPEN"),
+                severity=data.get("severity", "P2"),
+                count=data.get("count", 1),
+                first_seen=data.get("first_seen"),
+                service_name=data.get("service_name") or (data.get("services") or [None])[0],
+                analysis=data.get("latest_analysis") or {},
+                logs=logs_doc.to_dict().get("logs", []) if logs_doc is not None and logs_doc.exists else [],
+            )
+
+        # Groups written before denormalization: fall back to the first matching incident
         docs = await conn.collection("incidents").where(filter=FieldFilter("trace_id", "==", group_id)).limit(1).get()
         if not docs:
             raise HTTPException(status_code=404, detail="Group not found")
             
-        data = docs[0].to_dict()
-        analysis = data.get("analysis", {})
-        
-        return {
-            "id": group_id,
-            "name": analysis.get("cause", "Unknown Anomaly"),
-            "status": "OPEN",
-            "severity": data.get("priority", "P2"),
-            "summary": analysis.get("cause"),
-            "count": data.get("occurrence_count", 1),
-            "first_seen": data.get("timestamp"),
-            "service_name": data.get("service_name"),
-            "root_cause": {
-                "cause": analysis.get("cause"),
-                "confidence": round(analysis.get("confidence", 0) * 100) if analysis.get("confidence", 0) <= 1.0 else analysis.get("confidence", 0),
-                "evidence": [analysis.get("correlation_insight", "")]
-            },
-            "analysis": analysis,
-            "logs": data.get("logs", [])
-        }
+        incident = docs[0].to_dict()
+        analysis = incident.get("analysis", {})
+        return _group_detail(
+            group_id,
+            name=analysis.get("cause", "Unknown Anomaly"),
+            status=data.get("status", "OPEN") if data else "OPEN",
+            severity=incident.get("priority", "P2"),
+            count=incident.get("occurrence_count", 1),
+            first_seen=incident.get("timestamp"),
+            service_name=incident.get("service_name"),
+            analysis=analysis,
+            logs=await load_log_context(docs[0].reference, incident),
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
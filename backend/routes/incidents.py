@@ -1,89 +1,265 @@
-from fastapi import APIRouter, HTTPException
-from typing import Optional
-from google.cloud.firestore_v1.base_query import FieldFilter
-import sys
 import os
+from datetime import datetime
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import Any, Optional
 
-# Add parent directory to path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.registry import registry
+from core.read_model import read_model
+from core.incident_store import LIST_FIELDS, EXPORT_FIELDS, load_log_context, load_log_contexts
+from core.pagination import CURSOR_HEADER, encode_cursor, decode_cursor, clamp_limit, keyset_page
+from core.serialization import FastJSONResponse, dumps
+from core.lifecycle import lifecycle, ACTIONS
+from core.metrics import metrics
+from core.logger import get_logger
 
-try:
-    from core.agent import db
-except ImportError:
-    db = None
+logger = get_logger("routes.incidents")
 
 router = APIRouter(prefix="/incidents", tags=["Incidents"])
 
+# Documents per Firestore page while exporting; memory stays at about one page
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "500"))
+EXPORTED_ROWS = metrics.counter("rca_incident_export_rows_total", "Incidents streamed by /incidents/export")
+
 def get_db():
+    db = registry.get("db")
     if db is None:
         raise HTTPException(status_code=503, detail="Firebase is not initialized.")
     return db
 
-@router.get("")
+# Response schemas (documented in OpenAPI; the routes return pre-rendered FastJSONResponses)
+class IncidentItem(BaseModel):
+    id: str
+    trace_id: Optional[str] = None
+    service_name: Optional[str] = None
+    created_at: Optional[str] = None
+    timestamp: Optional[str] = None
+    priority: Optional[str] = None
+    status: str = "OPEN"
+    category: Optional[str] = None
+
+class IncidentDetail(BaseModel):
+    id: str
+    trace_id: Optional[str] = None
+    service_name: Optional[str] = None
+    timestamp: Optional[str] = None
+    analysis: dict[str, Any] = {}
+    logs: list[Any] = []
+    priority: Optional[str] = None
+    status: str = "OPEN"
+
+class BulkStatusRequest(BaseModel):
+    ids: Optional[list[str]] = None
+    group_ids: Optional[list[str]] = None
+    category: Optional[str] = None
+    status: Optional[str] = None
+    start: Optional[str] = None
+    end: Optional[str] = None
+
+def _incident_item(doc_id, data):
+    return {
+        "id": doc_id,
+        "trace_id": data.get("trace_id"),
+        "service_name": data.get("service_name"),
+        "created_at": data.get("timestamp"),
+        "timestamp": data.get("timestamp"), # Sync with frontend fix
+        "priority": data.get("priority"),
+        "status": data.get("status", "OPEN"),
+        "category": data.get("category")
+    }
+
+@router.get("", response_model=list[IncidentItem])
 async def list_incidents(
     group_id: Optional[str] = None, 
     category: Optional[str] = None,
     page: int = 1, 
-    limit: int = 10
+    limit: int = 10,
+    cursor: Optional[str] = None
+):
+    """
+    List all incidents, optionally filtered by group or category, newest first.
+    Pass the X-Next-Cursor response header back as `cursor` for the next page.
+    """
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    limit = clamp_limit(limit)
+    offset = 0 if after else (max(page, 1) - 1) * limit
+    filters = {"trace_id": group_id, "category": category if category and category != 'ALL' else None}
+
+    if read_model.ready:
+        # Served from the in-memory read model: exact at any depth, no Firestore reads
+        rows = read_model.incidents.query(filters, limit=limit, offset=offset, after=after)
+        incidents = [_incident_item(row["id"], row) for row in rows]
+    else:
+        # Fallback until the read model has bootstrapped
+        conn = get_db()
+        try:
+            docs = await keyset_page(
+                conn.collection("incidents"), "timestamp", filters, limit, after=after, offset=offset, fields=LIST_FIELDS
+            )
+            incidents = [_incident_item(doc.id, doc.to_dict()) for doc in docs]
+        except Exception as e:
+            return FastJSONResponse([])
+
+    headers = {}
+    if len(incidents) == limit:
+        headers[CURSOR_HEADER] = encode_cursor(incidents[-1]["timestamp"], incidents[-1]["id"])
+    return FastJSONResponse(incidents, headers=headers)
+
+def _parse_bound(value, name):
+    if value is None:
+        return None
+    try:
+        datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}: expected an ISO 8601 timestamp")
+    return value
+
+async def _export_pages(conn, filters, start, end, after, include_logs):
+    """Oldest-first pages of (ref, data) incidents, one keyset query at a time."""
+    collection = conn.collection("incidents")
+    fields = EXPORT_FIELDS + ["logs"] if include_logs else EXPORT_FIELDS  # legacy docs embed their logs
+    while True:
+        docs = await keyset_page(
+            collection, "timestamp", filters, EXPORT_PAGE_SIZE,
+            after=after, fields=fields, descending=False, start=start, end=end
+        )
+        if not docs:
+            return
+        rows = [(doc.reference, doc.to_dict()) for doc in docs]
+        yield rows
+        if len(docs) < EXPORT_PAGE_SIZE:
+            return
+        after = (rows[-1][1].get("timestamp"), rows[-1][0].id)
+
+def _ndjson(rows, logs):
+    chunk = bytearray()
+    for ref, data in rows:
+        data.pop("logs", None)
+        record = {"id": ref.id, **data}
+        if logs is not None:
+            record["logs"] = logs.get(ref.id, [])
+        chunk += dumps(record)
+        chunk += b"\n"
+    return bytes(chunk)
+
+@router.get("/export")
+async def export_incidents(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    group_id: Optional[str] = None,
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    include_logs: bool = False,
+    cursor: Optional[str] = None
 ):
-    """List all incidents, optionally filtered by group or category, with pagination"""
+    """
+    Stream incidents oldest-first as NDJSON, one incident per line.
+    `start` is inclusive and `end` exclusive (ISO 8601). To resume an
+    interrupted export, repeat the request with `cursor` set to the `id` of
+    the last line received. A failure mid-export aborts the transfer rather
+    than ending it cleanly. Send `Accept-Encoding: gzip` for a compressed stream.
+    """
+    start, end = _parse_bound(start, "start"), _parse_bound(end, "end")
     conn = get_db()
+    filters = {
+        "trace_id": group_id,
+        "category": category if category and category != 'ALL' else None,
+        "status": status if status and status != 'ALL' else None,
+    }
+
+    after = None
+    if cursor:
+        last = await conn.collection("incidents").document(cursor).get(field_paths=["timestamp"])
+        if not last.exists:
+            raise HTTPException(status_code=400, detail="Invalid cursor: unknown incident id")
+        after = (last.get("timestamp"), cursor)
+
+    pages = _export_pages(conn, filters, start, end, after, include_logs)
     try:
-        from google.cloud.firestore import Query
-        # Only order by timestamp to avoid requiring composite indexes
-        query = conn.collection("incidents").order_by("timestamp", direction=Query.DESCENDING)
-        
-        # Fetch larger batch for in-memory filtering
-        docs = await query.limit(300).get()
-        
-        all_incidents = []
-        for doc in docs:
-            data = doc.to_dict()
-            
-            # Apply In-Memory Filters
-            if group_id and data.get("trace_id") != group_id:
-                continue
-                
-            if category and category != 'ALL' and data.get("category") != category:
-                continue
-            
-            all_incidents.append({
-                "id": doc.id,
-                "trace_id": data.get("trace_id"),
-                "service_name": data.get("service_name"),
-                "created_at": data.get("timestamp"),
-                "timestamp": data.get("timestamp"), # Sync with frontend fix
-                "priority": data.get("priority"),
-                "status": data.get("status", "OPEN"),
-                "category": data.get("category")
-            })
-            
-        # Pagination
-        start = (page - 1) * limit
-        end = start + limit
-        return all_incidents[start:end]
+        # Read the first page up front so query errors (e.g. a missing index) still get a status code
+        first = await pages.__anext__()
+    except StopAsyncIteration:
+        first = []
     except Exception as e:
-        return []
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def encode(rows):
+        logs = await load_log_contexts(conn, rows) if include_logs else None
+        EXPORTED_ROWS.inc(len(rows))
+        return _ndjson(rows, logs)
+
+    async def stream():
+        try:
+            if first:
+                yield await encode(first)
+                async for rows in pages:
+                    yield await encode(rows)
+        except Exception as e:
+            # Headers are already sent: re-raise so the transfer aborts instead of ending cleanly,
+            # and the client resumes from the last complete line
+            logger.error(f"❌ Incident export aborted: {e}")
+            raise
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@router.post("/bulk/{action}", status_code=202)
+async def bulk_update_status(action: str, request: BulkStatusRequest):
+    """
+    Resolve, acknowledge or reopen incidents in bulk (`action` is resolve,
+    acknowledge or reopen). Select them by `ids`, by `group_ids`, or by
+    `category` / `status` / `start` / `end`. Runs in the background; poll
+    GET /incidents/bulk/{job_id} for progress.
+    """
+    if action not in ACTIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown action '{action}' (expected one of: {', '.join(ACTIONS)})")
+    filters = {k: v for k, v in {"category": request.category, "status": request.status}.items() if v and v != 'ALL'}
+    start, end = _parse_bound(request.start, "start"), _parse_bound(request.end, "end")
+    if not (request.ids or request.group_ids or filters or start or end):
+        raise HTTPException(status_code=400, detail="Select incidents with ids, group_ids or at least one filter")
+    conn = get_db()
+    job = lifecycle.start(
+        conn, action,
+        ids=list(dict.fromkeys(request.ids)) if request.ids else None,
+        group_ids=list(dict.fromkeys(request.group_ids)) if request.group_ids else None,
+        filters=filters, start=start, end=end
+    )
+    return job.to_dict()
+
+@router.get("/bulk/{job_id}")
+async def bulk_update_progress(job_id: str):
+    """Progress of a bulk lifecycle job"""
+    job = lifecycle.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
 
-@router.get("/{id}")
+@router.get("/{id}", response_model=IncidentDetail)
 async def get_incident_detail(id: str):
     """Get detailed information about a specific incident"""
     conn = get_db()
     try:
-        doc = await conn.collection("incidents").document(id).get()
+        ref = conn.collection("incidents").document(id)
+        doc = await ref.get()
         if not doc.exists:
             raise HTTPException(status_code=404, detail="Incident not found")
         
         data = doc.to_dict()
-        return {
+        logs = await load_log_context(ref, data)
+        return FastJSONResponse({
             "id": doc.id,
             "trace_id": data.get("trace_id"),
             "service_name": data.get("service_name"),
             "timestamp": data.get("timestamp"),
             "analysis": data.get("analysis", {}),
-            "logs": data.get("logs", []),
+            "logs": logs,
             "priority": data.get("priority"),
-            "status": "OPEN"
-        }
+            "status": data.get("status", "OPEN")
+        })
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -6,13 +6,23 @@ in Firestore with automatic token refresh.
 """
 import os
 import json
-from datetime import datetime
+import time
+import asyncio
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
 from cryptography.fernet import Fernet
 from firebase_admin import firestore
 
+from core.logger import get_logger
+from core.metrics import metrics
+
+logger = get_logger("credential_manager")
+
+CACHE_LOOKUPS = metrics.counter("rca_credential_cache_total", "Credential lookups by outcome", ("result",))
+FIRESTORE_BATCH_LIMIT = 500
+
 # Load encryption key from environment
 ENCRYPTION_KEY = os.getenv('CREDENTIAL_ENCRYPTION_KEY')
 
@@ -21,7 +31,7 @@ cipher = None
 if ENCRYPTION_KEY:
     cipher = Fernet(ENCRYPTION_KEY.encode())
 else:
-    print("⚠️ WARNING: CREDENTIAL_ENCRYPTION_KEY not set. Credentials will not be encrypted!")
+    logger.warning("⚠️ WARNING: CREDENTIAL_ENCRYPTION_KEY not set. Credentials will not be encrypted!")
 
 
 async def store_credentials(db, user_id: str, credentials: Credentials, project_id: Optional[str] = None) -> None:
@@ -67,33 +77,13 @@ async def store_credentials(db, user_id: str, credentials: Credentials, project_
     })
     
     await db.collection('user_credentials').document(user_id).set(data_to_store, merge=True)
-    print(f"✅ Stored credentials for user: {user_id}")
+    # A fresh login (or refresh) replaces whatever this process had cached
+    credential_cache.invalidate(user_id)
+    logger.info(f"✅ Stored credentials for user: {user_id}")
 
 
-async def get_credentials(db, user_id: str) -> Optional[Credentials]:
-    """
-    Retrieve and decrypt user credentials from Firestore
-    
-    Args:
-        db: Firestore client
-        user_id: Unique user identifier
-        
-    Returns:
-        Google OAuth Credentials object or None if not found
-        
-    Raises:
-        ValueError: If credentials not found or decryption fails
-    """
-    doc_ref = db.collection('user_credentials').document(user_id)
-    doc = await doc_ref.get()
-    
-    if not doc.exists:
-        raise ValueError(f"No credentials found for user: {user_id}")
-    
-    data = doc.to_dict()
-    project_id = data.get('project_id')
-    
-    # Decrypt or retrieve credentials
+def _decode_credentials(data: dict) -> Credentials:
+    """Decrypt a user_credentials document into a Credentials object."""
     if data.get('encrypted', False):
         if not cipher:
             raise ValueError("Cannot decrypt credentials: CREDENTIAL_ENCRYPTION_KEY not set")
@@ -112,8 +102,7 @@ async def get_credentials(db, user_id: str) -> Optional[Credentials]:
         except Exception:
             expiry = None
 
-    # Reconstruct Credentials object
-    credentials = Credentials(
+    return Credentials(
         token=creds_dict['token'],
         refresh_token=creds_dict['refresh_token'],
         token_uri=creds_dict['token_uri'],
@@ -122,22 +111,169 @@ async def get_credentials(db, user_id: str) -> Optional[Credentials]:
         scopes=creds_dict['scopes'],
         expiry=expiry
     )
-    
-    # Refresh if expired
-    if credentials.expired and credentials.refresh_token:
-        print(f"🔄 Refreshing expired token for user: {user_id}")
+
+
+class CredentialCache:
+    """
+    Expiry-aware per-user credential cache.
+
+    Entries are decrypted once and kept for CREDENTIAL_CACHE_TTL_SECONDS.
+    Tokens are refreshed CREDENTIAL_REFRESH_MARGIN_SECONDS before they
+    expire, in a worker thread, and concurrent callers for the same user
+    await one shared load/refresh. `last_used` is written back in batches
+    every CREDENTIAL_LAST_USED_FLUSH_SECONDS instead of on every call.
+    """
+
+    def __init__(self, ttl=600.0, refresh_margin=300.0, flush_interval=60.0):
+        self.ttl = ttl
+        self.refresh_margin = timedelta(seconds=refresh_margin)
+        self.flush_interval = flush_interval
+        self._entries = {}      # user_id -> {"credentials", "project_id", "loaded_at"}
+        self._inflight = {}     # user_id -> Task shared by concurrent callers
+        self._touched = set()   # user_ids whose last_used is pending
+        self._db = None
+        self._flush_task = None
+
+    def _needs_refresh(self, credentials):
+        if not credentials.refresh_token:
+            return False
+        if not credentials.token or credentials.expiry is None:
+            return credentials.expired
+        # google-auth keeps expiry as naive UTC
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return credentials.expiry - now <= self.refresh_margin
+
+    def _usable(self, entry):
+        return (
+            entry is not None
+            and time.monotonic() - entry["loaded_at"] < self.ttl
+            and not self._needs_refresh(entry["credentials"])
+        )
+
+    async def get(self, db, user_id: str):
+        """Return (credentials, project_id) for the user, loading or refreshing as needed."""
+        entry = self._entries.get(user_id)
+        if self._usable(entry):
+            CACHE_LOOKUPS.inc(result="hit")
+        else:
+            task = self._inflight.get(user_id)
+            if task is None:
+                task = asyncio.create_task(self._load(db, user_id, entry))
+                self._inflight[user_id] = task
+                task.add_done_callback(lambda _: self._inflight.pop(user_id, None))
+                CACHE_LOOKUPS.inc(result="miss")
+            else:
+                CACHE_LOOKUPS.inc(result="shared")
+            # Shielded so one cancelled caller doesn't abort the load for everyone else
+            entry = await asyncio.shield(task)
+        self._touch(db, user_id)
+        return entry["credentials"], entry["project_id"]
+
+    async def _load(self, db, user_id, entry):
+        if entry is None or time.monotonic() - entry["loaded_at"] >= self.ttl:
+            doc = await db.collection('user_credentials').document(user_id).get()
+            if not doc.exists:
+                self._entries.pop(user_id, None)
+                raise ValueError(f"No credentials found for user: {user_id}")
+            data = doc.to_dict()
+            entry = {"credentials": _decode_credentials(data), "project_id": data.get('project_id')}
+
+        credentials, project_id = entry["credentials"], entry["project_id"]
+        if self._needs_refresh(credentials):
+            logger.info(f"🔄 Refreshing token for user: {user_id}")
+            try:
+                # Token refresh is a blocking HTTP call; keep it off the event loop
+                await asyncio.to_thread(credentials.refresh, Request())
+                # Update stored credentials with new token, preserving project_id
+                await store_credentials(db, user_id, credentials, project_id=project_id)
+                CACHE_LOOKUPS.inc(result="refresh")
+                logger.info(f"✅ Token refreshed successfully for project: {project_id}")
+            except Exception as e:
+                self._entries.pop(user_id, None)
+                logger.error(f"❌ Failed to refresh token: {e}")
+                raise ValueError(f"Failed to refresh credentials: {e}")
+
+        entry = {"credentials": credentials, "project_id": project_id, "loaded_at": time.monotonic()}
+        self._entries[user_id] = entry
+        return entry
+
+    def invalidate(self, user_id: str):
+        self._entries.pop(user_id, None)
+
+    def _touch(self, db, user_id):
+        self._db = db
+        self._touched.add(user_id)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop(), name="credential-last-used")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self):
+        """Write pending last_used timestamps in batched commits."""
+        if not self._touched or self._db is None:
+            return
+        pending, self._touched = list(self._touched), set()
         try:
-            credentials.refresh(Request())
-            # Update stored credentials with new token, preserving project_id
-            await store_credentials(db, user_id, credentials, project_id=project_id)
-            print(f"✅ Token refreshed successfully for project: {project_id}")
+            for i in range(0, len(pending), FIRESTORE_BATCH_LIMIT):
+                batch = self._db.batch()
+                for user_id in pending[i:i + FIRESTORE_BATCH_LIMIT]:
+                    batch.update(
+                        self._db.collection('user_credentials').document(user_id),
+                        {'last_used': firestore.SERVER_TIMESTAMP}
+                    )
+                await batch.commit()
         except Exception as e:
-            print(f"❌ Failed to refresh token: {e}")
-            raise ValueError(f"Failed to refresh credentials: {e}")
+            logger.warning(f"⚠️ Failed to write last_used for {len(pending)} user(s): {e}")
+
+    async def stop(self):
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+    def stats(self):
+        return {
+            "cached_users": len(self._entries),
+            "inflight": len(self._inflight),
+            "pending_last_used": len(self._touched),
+        }
+
+
+credential_cache = CredentialCache(
+    ttl=float(os.getenv("CREDENTIAL_CACHE_TTL_SECONDS", "600")),
+    refresh_margin=float(os.getenv("CREDENTIAL_REFRESH_MARGIN_SECONDS", "300")),
+    flush_interval=float(os.getenv("CREDENTIAL_LAST_USED_FLUSH_SECONDS", "60")),
+)
+
+
+async def get_credentials_and_project(db, user_id: str):
+    """
+    Retrieve (credentials, project_id) for a user through the in-process cache
     
-    # Update last_used timestamp
-    await doc_ref.update({'last_used': firestore.SERVER_TIMESTAMP})
+    Raises:
+        ValueError: If credentials not found, decryption fails or refresh fails
+    """
+    return await credential_cache.get(db, user_id)
+
+
+async def get_credentials(db, user_id: str) -> Optional[Credentials]:
+    """
+    Retrieve and decrypt user credentials (cached, refreshed before expiry)
     
+    Args:
+        db: Firestore client
+        user_id: Unique user identifier
+        
+    Returns:
+        Google OAuth Credentials object or None if not found
+        
+    Raises:
+        ValueError: If credentials not found or decryption fails
+    """
+    credentials, _ = await credential_cache.get(db, user_id)
     return credentials
 
 
@@ -154,10 +290,11 @@ async def delete_credentials(db, user_id: str) -> bool:
     """
     try:
         await db.collection('user_credentials').document(user_id).delete()
-        print(f"🗑️ Deleted credentials for user: {user_id}")
+        credential_cache.invalidate(user_id)
+        logger.info(f"🗑️ Deleted credentials for user: {user_id}")
         return True
     except Exception as e:
-        print(f"❌ Failed to delete credentials: {e}")
+        logger.error(f"❌ Failed to delete credentials: {e}")
         return False
 
 
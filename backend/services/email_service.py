@@ -1,77 +1,280 @@
-import smtplib
+"""
+Alert Email Delivery
+
+send_alert_email() only enqueues; delivery happens in the background:
+
+- Connections: up to SMTP_POOL_SIZE authenticated SMTP sessions
+  (STARTTLS + LOGIN once) are kept open and reused. A session that fails
+  or sits idle past SMTP_IDLE_SECONDS is closed and re-established.
+- Rate: a token bucket caps sends at SMTP_MAX_PER_MINUTE, which keeps
+  bursts under Gmail's throttling.
+- Digests: the first alert for a (recipient, rule) is sent right away.
+  Further alerts for it within ALERT_DIGEST_SECONDS are folded into one
+  digest email at the end of the window.
+- Templates: the HTML and text bodies are built once at import; each
+  send only substitutes escaped values.
+"""
 import os
+import html
+import time
+import asyncio
+from string import Template
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from dotenv import load_dotenv
 
+from core.fair_share import TokenBucket
+from core.metrics import metrics
+from core.logger import get_logger
+
 # Load .env from backend root (parent of services/)
 parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 load_dotenv(os.path.join(parent_dir, ".env"))
 
+logger = get_logger("email_service")
+
+POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "2"))
+IDLE_SECONDS = float(os.getenv("SMTP_IDLE_SECONDS", "240"))
+MAX_PER_MINUTE = float(os.getenv("SMTP_MAX_PER_MINUTE", "20"))
+DIGEST_SECONDS = float(os.getenv("ALERT_DIGEST_SECONDS", "60"))
+SEND_ATTEMPTS = 3
+DASHBOARD_URL = os.getenv("FRONTEND_URL", "http://localhost:5173") + "/incidents"
+
+EMAILS_SENT = metrics.counter("rca_alert_emails_total", "Alert emails by kind and outcome", ("kind", "result"))
+ALERTS_FOLDED = metrics.counter("rca_alert_emails_folded_total", "Alerts folded into a digest instead of sent alone")
+SMTP_CONNECTS = metrics.counter("rca_smtp_connections_total", "SMTP sessions opened (STARTTLS + LOGIN)", ("result",))
+SEND_QUEUE = metrics.gauge("rca_alert_email_queue_depth", "Alert emails waiting for an SMTP session")
+
+# --- 1. TEMPLATES (built once) ---
+_HTML = Template("""
+<html>
+  <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+    <div style="background-color: #0d1117; padding: 20px; color: #fff; border-radius: 10px;">
+      <h2 style="color: #00d1ff;">🚨 $heading</h2>
+      $rows
+      <p style="margin-top: 20px;">
+        <a href="$url" style="background-color: #00d1ff; color: #000; padding: 10px 20px; text-decoration: none; border-radius: 5px; font-weight: bold;">VIEW IN MISSION CONTROL</a>
+      </p>
+    </div>
+  </body>
+</html>
+""")
+_HTML_ROW = Template("""
+      <div style="background: rgba(255,255,255,0.05); padding: 15px; margin-bottom: 10px; border-radius: 5px; border-left: 4px solid #00d1ff;">
+        <p><strong>Trace ID:</strong> <code>$trace_id</code></p>
+        <p><strong>Category:</strong> $category</p>
+        <p><strong>Priority:</strong> $priority</p>
+        <p><strong>Summary:</strong> $summary</p>$trigger
+      </div>""")
+_TEXT = Template("""$heading
+
+$rows
+Action Required: Please check the Mission Control dashboard: $url
+""")
+_TEXT_ROW = Template("""Incident Details:
+- Trace ID: $trace_id
+- Category: $category
+- Priority: $priority
+- Summary: $summary
+$trigger""")
+
+
+def _trigger(incident_data):
+    """Why a threshold rule fired, e.g. "6 incidents in 5 min" (None if not given)."""
+    count, window = incident_data.get("count"), incident_data.get("window_minutes")
+    if count is None:
+        return None
+    return f"{count} incidents in {window} min" if window else f"{count} incidents"
+
+
+def _fields(incident_data, escape):
+    values = {
+        "trace_id": incident_data.get("trace_id"),
+        "category": incident_data.get("category"),
+        "priority": incident_data.get("priority"),
+        "summary": incident_data.get("redacted_text"),
+    }
+    fields = {k: html.escape(str(v)) if escape else str(v) for k, v in values.items()}
+    trigger = _trigger(incident_data)
+    if trigger is None:
+        fields["trigger"] = ""
+    elif escape:
+        fields["trigger"] = f"\n        <p><strong>Trigger:</strong> {html.escape(trigger)}</p>"
+    else:
+        fields["trigger"] = f"- Trigger: {trigger}\n"
+    return fields
+
+
+def render_alert(alert_name, incidents, folded=0):
+    """(subject, text, html) for one alert, or a digest when several incidents are given."""
+    if len(incidents) == 1:
+        subject = heading = f"Alert Triggered: {alert_name}"
+    else:
+        subject = f"{len(incidents)} alerts: {alert_name}"
+        heading = f"{len(incidents)} alerts for {alert_name} in the last {DIGEST_SECONDS:.0f}s"
+    if folded:
+        heading += f" (+{folded} more not shown)"
+    text = _TEXT.substitute(
+        heading=heading, url=DASHBOARD_URL, rows="\n".join(_TEXT_ROW.substitute(_fields(i, False)) for i in incidents)
+    )
+    body = _HTML.substitute(
+        heading=html.escape(heading), url=html.escape(DASHBOARD_URL),
+        rows="".join(_HTML_ROW.substitute(_fields(i, True)) for i in incidents)
+    )
+    return f"🚨 CLOUD ALERT: {subject}", text, body
+
+
+# --- 2. SERVICE ---
 class EmailService:
+    # Digests list at most this many incidents; the rest are only counted
+    DIGEST_MAX_ROWS = 50
+
     def __init__(self):
         self.smtp_server = "smtp.gmail.com"
         self.smtp_port = 587
         self.sender_email = os.getenv("GMAIL_USER")
         self.sender_password = os.getenv("GMAIL_APP_PASSWORD")
+        self._queue = None
+        self._senders = []
+        self._idle = []  # [(smtp session, last used)]
+        self._bucket = TokenBucket(MAX_PER_MINUTE)
+        self._windows = {}  # (recipient, alert name) -> {"items", "folded", "task"}
 
     async def send_alert_email(self, recipient_email, alert_name, incident_data):
+        """Queue an alert (or fold it into the pending digest); returns False if email isn't configured."""
         if not self.sender_email or not self.sender_password:
-            print("⚠️ Email Service: GMAIL_USER or GMAIL_APP_PASSWORD not set. Skipping email.")
+            logger.warning("⚠️ Email Service: GMAIL_USER or GMAIL_APP_PASSWORD not set. Skipping email.")
             return False
+        self._start()
+
+        key = (recipient_email, alert_name)
+        window = self._windows.get(key)
+        if window is None:
+            # Leading edge: send now, then coalesce whatever follows within the window
+            self._windows[key] = {"items": [], "folded": 0, "task": asyncio.create_task(self._close_window(key))}
+            self._enqueue(recipient_email, "single", render_alert(alert_name, [incident_data]))
+        elif len(window["items"]) < self.DIGEST_MAX_ROWS:
+            window["items"].append(incident_data)
+            ALERTS_FOLDED.inc()
+        else:
+            window["folded"] += 1
+            ALERTS_FOLDED.inc()
+        return True
+
+    async def _close_window(self, key):
+        """Every DIGEST_SECONDS, send what was folded for `key`; stop once a window passes quietly."""
+        recipient, alert_name = key
+        while True:
+            await asyncio.sleep(DIGEST_SECONDS)
+            window = self._windows[key]
+            if not window["items"]:
+                del self._windows[key]
+                return
+            items, folded = window["items"], window["folded"]
+            window["items"], window["folded"] = [], 0
+            kind = "digest" if len(items) + folded > 1 else "single"
+            self._enqueue(recipient, kind, render_alert(alert_name, items, folded))
+
+    def _enqueue(self, recipient, kind, rendered):
+        self._queue.put_nowait((recipient, kind, rendered))
+        SEND_QUEUE.set(self._queue.qsize())
 
+    def _start(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._senders = [
+                asyncio.create_task(self._sender_loop(), name=f"smtp-sender-{i}") for i in range(max(1, POOL_SIZE))
+            ]
+
+    # --- 3. SENDING ---
+    async def _sender_loop(self):
+        while True:
+            recipient, kind, (subject, text, body) = await self._queue.get()
+            SEND_QUEUE.set(self._queue.qsize())
+            wait = self._bucket.reserve(1)
+            if wait:
+                await asyncio.sleep(wait)
+            ok = await self._deliver(recipient, subject, text, body)
+            EMAILS_SENT.inc(kind=kind, result="sent" if ok else "failed")
+            self._queue.task_done()
+
+    async def _deliver(self, recipient, subject, text, body):
         message = MIMEMultipart("alternative")
-        message["Subject"] = f"🚨 CLOUD ALERT: {alert_name}"
+        message["Subject"] = subject
         message["From"] = f"Cloud RCA Agent <{self.sender_email}>"
-        message["To"] = recipient_email
-
-        # ... (parts of the email remain the same)
-        text = f"""
-        Alert Triggered: {alert_name}
-        
-        Incident Details:
-        - Trace ID: {incident_data.get('trace_id')}
-        - Category: {incident_data.get('category')}
-        - Priority: {incident_data.get('priority')}
-        - Summary: {incident_data.get('redacted_text')}
-        
-        Action Required: Please check the Mission Control dashboard.
-        """
-        
-        html = f"""
-        <html>
-          <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="background-color: #0d1117; padding: 20px; color: #fff; border-radius: 10px;">
-              <h2 style="color: #00d1ff;">🚨 Alert Triggered: {alert_name}</h2>
-              <div style="background: rgba(255,255,255,0.05); padding: 15px; border-radius: 5px; border-left: 4px solid #00d1ff;">
-                <p><strong>Trace ID:</strong> <code>{incident_data.get('trace_id')}</code></p>
-                <p><strong>Category:</strong> {incident_data.get('category')}</p>
-                <p><strong>Priority:</strong> {incident_data.get('priority')}</p>
-                <p><strong>Summary:</strong> {incident_data.get('redacted_text')}</p>
-              </div>
-              <p style="margin-top: 20px;">
-                <a href="http://localhost:5173/incidents" style="background-color: #00d1ff; color: #000; padding: 10px 20px; text-decoration: none; border-radius: 5px; font-weight: bold;">VIEW IN MISSION CONTROL</a>
-              </p>
-            </div>
-          </body>
-        </html>
-        """
-
-        part1 = MIMEText(text, "plain")
-        part2 = MIMEText(html, "html")
-        message.attach(part1)
-        message.attach(part2)
+        message["To"] = recipient
+        message.attach(MIMEText(text, "plain"))
+        message.attach(MIMEText(body, "html"))
+
+        for attempt in range(1, SEND_ATTEMPTS + 1):
+            smtp = None
+            try:
+                smtp = await self._acquire()
+                await smtp.send_message(message)
+                self._idle.append((smtp, time.monotonic()))
+                logger.info(f"✅ Alert email sent to {recipient}")
+                return True
+            except Exception as e:
+                # Drop the session; the next attempt reconnects
+                await self._close(smtp)
+                if attempt == SEND_ATTEMPTS:
+                    logger.error(f"❌ Failed to send email: {e}")
+                    return False
+                await asyncio.sleep(2 ** attempt)
 
+    async def _acquire(self):
+        """A logged-in session: an idle one if still fresh and connected, else a new one."""
+        while self._idle:
+            smtp, last_used = self._idle.pop()
+            if time.monotonic() - last_used < IDLE_SECONDS and smtp.is_connected:
+                return smtp
+            await self._close(smtp)
+
+        import aiosmtplib
+        smtp = aiosmtplib.SMTP(hostname=self.smtp_server, port=self.smtp_port, start_tls=True)
         try:
-            import aiosmtplib
-            async with aiosmtplib.SMTP(hostname=self.smtp_server, port=self.smtp_port, use_tls=False) as server:
-                await server.starttls()
-                await server.login(self.sender_email, self.sender_password)
-                await server.send_message(message)
-            print(f"✅ Alert email sent to {recipient_email}")
-            return True
-        except Exception as e:
-            print(f"❌ Failed to send email: {e}")
-            return False
+            await smtp.connect()  # includes STARTTLS
+            await smtp.login(self.sender_email, self.sender_password)
+        except Exception:
+            SMTP_CONNECTS.inc(result="failed")
+            await self._close(smtp)
+            raise
+        SMTP_CONNECTS.inc(result="ok")
+        return smtp
+
+    async def _close(self, smtp):
+        if smtp is None:
+            return
+        try:
+            if smtp.is_connected:
+                await smtp.quit()
+        except Exception:
+            smtp.close()
+
+    async def stop(self, timeout=10.0):
+        """Send pending digests and queued emails (up to `timeout` seconds), then close the sessions."""
+        if self._queue is None:
+            return
+        for (recipient, alert_name), window in list(self._windows.items()):
+            window["task"].cancel()
+            if window["items"]:
+                self._enqueue(recipient, "digest", render_alert(alert_name, window["items"], window["folded"]))
+        self._windows.clear()
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Email Service: {self._queue.qsize()} alert emails dropped at shutdown")
+        for task in self._senders:
+            task.cancel()
+        while self._idle:
+            await self._close(self._idle.pop()[0])
+        self._queue, self._senders = None, []
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "idle_sessions": len(self._idle),
+            "digest_windows": len(self._windows),
+        }
 
 email_service = EmailService()
@@ -2,10 +2,17 @@
 import json
 import re
 import os
+import time
+import hashlib
+import threading
 from datetime import datetime, timedelta
-from collections import defaultdict
-from google.cloud import logging_v2
-from google_auth_oauthlib.flow import InstalledAppFlow
+from collections import defaultdict, OrderedDict
+from contextlib import contextmanager
+# google.cloud.logging_v2 is imported inside fetch_logs: it is heavy and only needed per scan
+from core.metrics import metrics
+from core.logger import get_logger
+
+logger = get_logger("log_collector")
 
 # Default values (can be overridden)
 DEFAULT_PROJECT_ID = "project-e2bcb697-e160-439a-a3c"
@@ -19,6 +26,14 @@ SCOPES = [
 # Data directory for storing logs
 DATA_DIR = "data"
 
+PAGE_SIZE = 1000
+
+LOGGING_FETCH_SECONDS = metrics.histogram("rca_logging_fetch_seconds", "Cloud Logging list_entries time per scan (including parsing)")
+LOGGING_PAGES = metrics.counter("rca_logging_pages_total", "Cloud Logging result pages read")
+LOG_ENTRIES = metrics.counter("rca_log_entries_total", "Raw log entries read, by parse result", ("result",))
+CLIENT_LOOKUPS = metrics.counter("rca_logging_clients_total", "Logging client pool lookups by outcome", ("result",))
+CLIENT_POOL_SIZE = metrics.gauge("rca_logging_client_pool_size", "Logging clients currently pooled")
+
 
 # OAuth authentication is now handled by credential_manager.py
 # This function is kept for backward compatibility but should not be used
@@ -142,10 +157,165 @@ def save_logs_to_json(traces, filename=None, project_id=None, service_name=None)
     with open(filepath, 'w', encoding='utf-8') as f:
         json.dump(output_data, f, indent=2, ensure_ascii=False)
     
-    print(f"💾 Saved logs to: {filepath}")
+    logger.info(f"💾 Saved logs to: {filepath}")
     return filepath
 
 
+def _credential_identity(credentials):
+    """Stable per-grant key that survives token refreshes (secrets are hashed, not kept)."""
+    if credentials is None:
+        return "default"
+    raw = f"{getattr(credentials, 'client_id', '')}:{getattr(credentials, 'refresh_token', '') or id(credentials)}"
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+
+def _build_client(project, credentials):
+    from google.cloud import logging_v2
+
+    # Optional endpoint override (e.g. utils/mock_servers.py for offline load tests)
+    endpoint = os.getenv("LOGGING_API_ENDPOINT")
+    if endpoint:
+        # The mock server speaks the JSON/HTTP API, so skip gRPC
+        return logging_v2.Client(
+            project=project,
+            credentials=credentials,
+            client_options={"api_endpoint": endpoint},
+            _use_grpc=False,
+        )
+    return logging_v2.Client(project=project, credentials=credentials)
+
+
+def _close_client(client):
+    close = getattr(client, "close", None)
+    if close:
+        try:
+            close()
+        except Exception:
+            pass
+
+
+class LoggingClientPool:
+    """
+    Bounded LRU pool of Cloud Logging clients keyed by (project, credential).
+
+    fetch_logs runs in worker threads, so the pool is guarded by a plain
+    lock. Clients idle for longer than `idle_seconds` are evicted, and a
+    client is rebuilt when the caller's access token no longer matches the
+    one it was built with (i.e. the token was refreshed).
+
+    Callers hold a client through lease(); an evicted client is only closed
+    once its last lease is released, so a scan still paging through results
+    keeps a working client. Clients are built outside the pool lock behind a
+    per-key lock: concurrent scans of one project share a single build, and
+    a slow build never blocks other tenants.
+    """
+
+    def __init__(self, max_size=64, idle_seconds=600.0):
+        self.max_size = max_size
+        self.idle_seconds = idle_seconds
+        self._clients = OrderedDict()  # key -> {"client", "token", "last_used", "refs", "retired"}
+        self._lock = threading.Lock()
+        self._build_locks = {}  # key -> lock held while that key's client is built
+
+    @contextmanager
+    def lease(self, project, credentials):
+        """Yield a client for `project`, kept open until the block exits."""
+        entry = self._acquire(project, credentials)
+        try:
+            yield entry["client"]
+        finally:
+            self._release(entry)
+
+    def _acquire(self, project, credentials):
+        key = (project, os.getenv("LOGGING_API_ENDPOINT"), _credential_identity(credentials))
+        token = getattr(credentials, "token", None)
+        stale = []
+        try:
+            with self._lock:
+                entry = self._checkout(key, token, stale)
+                if entry:
+                    CLIENT_LOOKUPS.inc(result="hit")
+                    return entry
+                build_lock = self._build_locks.setdefault(key, threading.Lock())
+
+            with build_lock:
+                with self._lock:
+                    # Another thread may have built it while we waited
+                    entry = self._checkout(key, token, stale)
+                    if entry:
+                        CLIENT_LOOKUPS.inc(result="hit")
+                        return entry
+                try:
+                    client = _build_client(project, credentials)
+                except Exception as e:
+                    logger.error(f"❌ Failed to initialize logging client: {e}")
+                    raise
+
+                with self._lock:
+                    old = self._clients.pop(key, None)
+                    CLIENT_LOOKUPS.inc(result="rebuilt" if old else "built")
+                    if old:
+                        stale.extend(self._retire(old))
+                    entry = {"client": client, "token": token, "last_used": time.monotonic(), "refs": 1, "retired": False}
+                    self._clients[key] = entry
+                    while len(self._clients) > self.max_size:
+                        evicted_key, evicted = self._clients.popitem(last=False)
+                        self._build_locks.pop(evicted_key, None)
+                        stale.extend(self._retire(evicted))
+                    CLIENT_POOL_SIZE.set(len(self._clients))
+                return entry
+        finally:
+            for old_client in stale:
+                _close_client(old_client)
+
+    def _checkout(self, key, token, stale):
+        """Under the lock: evict idle clients into `stale`, then lease the client for `key` if its token is current."""
+        now = time.monotonic()
+        for idle_key in [k for k, e in self._clients.items() if now - e["last_used"] > self.idle_seconds and not e["refs"]]:
+            self._build_locks.pop(idle_key, None)
+            stale.extend(self._retire(self._clients.pop(idle_key)))
+        CLIENT_POOL_SIZE.set(len(self._clients))
+        entry = self._clients.get(key)
+        if not entry or entry["token"] != token:
+            return None
+        entry["refs"] += 1
+        entry["last_used"] = now
+        self._clients.move_to_end(key)
+        return entry
+
+    def _retire(self, entry):
+        """Under the lock: take `entry` out of service; returns its client if it can be closed now."""
+        entry["retired"] = True
+        return [] if entry["refs"] else [entry["client"]]
+
+    def _release(self, entry):
+        with self._lock:
+            entry["refs"] -= 1
+            entry["last_used"] = time.monotonic()
+            close = entry["retired"] and not entry["refs"]
+        if close:
+            _close_client(entry["client"])
+
+    def clear(self):
+        with self._lock:
+            clients = [c for e in self._clients.values() for c in self._retire(e)]
+            self._clients.clear()
+            self._build_locks.clear()
+            CLIENT_POOL_SIZE.set(0)
+        for client in clients:
+            _close_client(client)
+
+    def stats(self):
+        leased = sum(1 for e in self._clients.values() if e["refs"])
+        return {"pooled": len(self._clients), "leased": leased, "max_size": self.max_size, "idle_seconds": self.idle_seconds}
+
+
+logging_client_pool = LoggingClientPool(
+    max_size=int(os.getenv("LOGGING_CLIENT_POOL_SIZE", "64")),
+    idle_seconds=float(os.getenv("LOGGING_CLIENT_IDLE_SECONDS", "600")),
+)
+
+
 def fetch_logs(credentials, time_range_minutes=60, save_to_file=True, filename=None, project_id=None, service_name=None):
     """
     Fetch logs from Cloud Run for given time range
@@ -165,16 +335,12 @@ def fetch_logs(credentials, time_range_minutes=60, save_to_file=True, filename=N
     project = project_id or DEFAULT_PROJECT_ID
     service = service_name or DEFAULT_SERVICE_NAME
     
-    print(f"🔍 Initializing Logging Client - Project: {project}, Service: {service}")
+    logger.info(f"🔍 Initializing Logging Client - Project: {project}, Service: {service}")
     if credentials:
-        print(f"🔑 Auth Token present: {bool(credentials.token)}")
-    
-    try:
-        client = logging_v2.Client(project=project, credentials=credentials)
-    except Exception as e:
-        print(f"❌ Failed to initialize logging client: {e}")
-        raise
+        logger.info(f"🔑 Auth Token present: {bool(credentials.token)}")
     
+    from google.cloud import logging_v2
+
     # Time filter for recent logs
     start_time = datetime.utcnow() - timedelta(minutes=time_range_minutes)
     timestamp_filter = f'timestamp >= "{start_time.isoformat()}Z"'
@@ -187,22 +353,31 @@ def fetch_logs(credentials, time_range_minutes=60, save_to_file=True, filename=N
         {timestamp_filter}
     '''
     
-    entries_iter = client.list_entries(
-        filter_=log_filter,
-        order_by=logging_v2.DESCENDING,
-        page_size=1000,
-    )
-    
     traces = defaultdict(list)
     count_entries = 0
     count_parsed = 0
     
-    for entry in entries_iter:
-        count_entries += 1
-        parsed = parse_log_entry(entry)
-        if parsed and parsed["trace_id"]:
-            count_parsed += 1
-            traces[parsed["trace_id"]].append(parsed)
+    # The lease keeps the client open while its pages are read, even if the pool evicts it meanwhile
+    with logging_client_pool.lease(project, credentials) as client:
+        entries_iter = client.list_entries(
+            filter_=log_filter,
+            order_by=logging_v2.DESCENDING,
+            page_size=PAGE_SIZE,
+        )
+        
+        started = time.perf_counter()
+        # Walk the API's pages so short or truncated pages show up in the page count
+        for page in entries_iter.pages:
+            LOGGING_PAGES.inc()
+            for entry in page:
+                count_entries += 1
+                parsed = parse_log_entry(entry)
+                if parsed and parsed["trace_id"]:
+                    count_parsed += 1
+                    traces[parsed["trace_id"]].append(parsed)
+    LOGGING_FETCH_SECONDS.observe(time.perf_counter() - started)
+    LOG_ENTRIES.inc(count_parsed, result="parsed")
+    LOG_ENTRIES.inc(count_entries - count_parsed, result="rejected")
     
     # Sort logs within each trace by timestamp
     for trace_id in traces:
@@ -210,8 +385,10 @@ def fetch_logs(credentials, time_range_minutes=60, save_to_file=True, filename=N
     
     traces_dict = dict(traces)
     
-    print(f"✅ Fetched {count_parsed} logs across {len(traces_dict)} traces")
-    print(f"   (Raw entries: {count_entries} | Parsed: {count_parsed})")
+    logger.info(
+        f"✅ Fetched {count_parsed} logs across {len(traces_dict)} traces (Raw entries: {count_entries} | Parsed: {count_parsed})",
+        extra={"project_id": project, "raw_entries": count_entries, "parsed": count_parsed, "traces": len(traces_dict)}
+    )
     
     # Save to file if requested
     if save_to_file:
@@ -0,0 +1,155 @@
+"""
+Serialization and wire-size benchmark for the heavy read endpoints
+
+Renders synthetic payloads shaped like /analytics/trends, /incidents/{id}
+and /groups the way FastAPI did before (jsonable_encoder + stdlib json)
+and the way the routes do now (core.serialization.dumps, orjson when
+installed), then reports the bytes sent with and without gzip.
+
+Usage:
+    python utils/bench_serialization.py [--runs 200] [--level 6]
+"""
+import os
+import sys
+import gzip
+import json
+import time
+import random
+import argparse
+import statistics
+from datetime import datetime, timedelta
+
+# Add root directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SERVICES = ["checkout", "payments", "inventory", "auth", "search", "gateway"]
+CATEGORIES = ["Database", "Network", "Memory", "Configuration", "Dependency"]
+
+
+def _ts(hours_ago):
+    return (datetime(2026, 1, 1) - timedelta(hours=hours_ago)).isoformat()
+
+
+def trends_payload(rng):
+    return {
+        "trends": [{"date": f"Dec {day:02d}", "errors": rng.randint(0, 500), "anomalies": rng.randint(0, 40)} for day in range(1, 31)],
+        "topCategories": [{"name": s, "value": rng.randint(1, 900)} for s in SERVICES[:5]],
+        "statusDistribution": [{"name": s, "value": rng.randint(0, 200)} for s in ("Open", "Investigating", "Resolved")],
+        "riskMatrix": [
+            {
+                "confidence": rng.randint(40, 99),
+                "impact": rng.randint(1, 4),
+                "service": rng.choice(SERVICES),
+                "label": rng.choice(CATEGORIES) + " saturation on primary shard",
+                "id": f"{rng.getrandbits(32):08x}",
+            }
+            for _ in range(30)
+        ],
+    }
+
+
+def incident_payload(rng):
+    logs = [
+        {
+            "timestamp": _ts(i / 60),
+            "severity": rng.choice(["ERROR", "WARNING", "CRITICAL"]),
+            "service": rng.choice(SERVICES),
+            "message": "upstream connect error or disconnect/reset before headers. reset reason: connection failure, "
+                       f"transport failure reason: delayed connect error: 111 (attempt {i})",
+            "trace_id": "projects/demo/traces/" + f"{rng.getrandbits(128):032x}",
+            "labels": {"region": "us-central1", "revision": f"checkout-000{i % 9}-abc", "pod": f"checkout-{i}"},
+        }
+        for i in range(20)
+    ]
+    return {
+        "id": f"{rng.getrandbits(80):020x}",
+        "trace_id": f"{rng.getrandbits(128):032x}",
+        "service_name": "checkout",
+        "timestamp": _ts(0),
+        "analysis": {
+            "cause": "Connection pool exhaustion on the primary database shard",
+            "confidence": 0.87,
+            "category": "Database",
+            "correlation_insight": "Error spike follows the 14:02 deploy of checkout revision 0007 within 90 seconds. " * 3,
+            "remediation": ["Raise pool size to 50", "Roll back checkout-0007", "Add circuit breaker on payments"],
+        },
+        "logs": logs,
+        "priority": "P1",
+        "status": "OPEN",
+    }
+
+
+def groups_payload(rng):
+    return [
+        {
+            "id": f"{rng.getrandbits(128):032x}",
+            "name": rng.choice(CATEGORIES) + " failure in " + rng.choice(SERVICES),
+            "category": rng.choice(CATEGORIES),
+            "status": rng.choice(["OPEN", "INVESTIGATING", "RESOLVED"]),
+            "severity": rng.choice(["P0", "P1", "P2", "P3"]),
+            "count": rng.randint(1, 5000),
+            "first_seen": _ts(rng.randint(24, 400)),
+            "last_seen": _ts(rng.randint(0, 24)),
+            "services": rng.sample(SERVICES, 2),
+            "root_cause": {"cause": "Timeouts calling the payments API", "confidence": 0.74},
+            "route": "GCP Cloud Run",
+            "latest_incident_id": f"{rng.getrandbits(80):020x}",
+            "service_name": rng.choice(SERVICES),
+        }
+        for _ in range(200)
+    ]
+
+
+def time_us(fn, payload, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn(payload)
+        samples.append((time.perf_counter() - started) * 1e6)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON serialization and gzip wire-size benchmark")
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--level", type=int, default=int(os.getenv("GZIP_COMPRESS_LEVEL", "6")))
+    args = parser.parse_args()
+
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from core.serialization import FastJSONResponse, orjson
+
+    before_response, after_response = JSONResponse(None), FastJSONResponse(None)
+
+    def before(payload):
+        # FastAPI's path for a plain dict/list return without a response_model
+        return before_response.render(jsonable_encoder(payload))
+
+    def after(payload):
+        return after_response.render(payload)
+
+    rng = random.Random(42)
+    payloads = {
+        "/analytics/trends?range=30d": trends_payload(rng),
+        "/incidents/{id}": incident_payload(rng),
+        "/groups?limit=200": groups_payload(rng),
+    }
+
+    print("=" * 78)
+    print(f"encoder: {'orjson ' + orjson.__version__ if orjson else 'stdlib json (orjson not installed)'} | gzip level {args.level} | {args.runs} runs")
+    print(f"{'route':<30}{'before µs':>10}{'after µs':>10}{'speedup':>9}{'raw B':>9}{'gzip B':>9}{'ratio':>7}")
+    for route, payload in payloads.items():
+        body = after(payload)
+        assert json.loads(body) == json.loads(before(payload)), f"{route}: output differs"
+        before_us = time_us(before, payload, args.runs)
+        after_us = time_us(after, payload, args.runs)
+        compressed = len(gzip.compress(body, compresslevel=args.level))
+        print(
+            f"{route:<30}{before_us:>10.0f}{after_us:>10.0f}{before_us / after_us:>8.1f}x"
+            f"{len(body):>9}{compressed:>9}{compressed / len(body):>7.0%}"
+        )
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Startup / import-time profile for the API process
+
+Measures, in fresh interpreters:
+  1. wall time of `import api` (what every uvicorn worker pays before serving)
+  2. the slowest imports from `python -X importtime`
+  3. first-use initialization time of each lazily created service
+
+Usage:
+    python utils/bench_startup.py [--runs 5] [--top 15]
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+import statistics
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import api; print(time.perf_counter() - t)"
+WARM_SNIPPET = (
+    "import json, api; from core.registry import registry; registry.warm(); "
+    "print(json.dumps(registry.status()))"
+)
+
+
+def run_python(args):
+    return subprocess.run(
+        [sys.executable, *args], cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+
+
+def import_wall_times(runs):
+    times = []
+    for _ in range(runs):
+        result = run_python(["-c", IMPORT_SNIPPET])
+        if result.returncode != 0:
+            print(result.stderr)
+            raise SystemExit("❌ `import api` failed")
+        times.append(float(result.stdout.strip().splitlines()[-1]))
+    return times
+
+
+def slowest_imports(top):
+    """Parse `-X importtime` (stderr) into (cumulative_us, module) sorted descending."""
+    result = run_python(["-X", "importtime", "-c", "import api"])
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, module = line[len("import time:"):].split("|", 2)
+        rows.append((int(cumulative_us), module.strip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def service_init_times():
+    result = run_python(["-c", WARM_SNIPPET])
+    if result.returncode != 0:
+        return {}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time profile for the API process")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    times = import_wall_times(args.runs)
+    print("=" * 60)
+    print(f"`import api` over {args.runs} fresh interpreters:")
+    print(f"   median {statistics.median(times) * 1000:.0f} ms | min {min(times) * 1000:.0f} ms | max {max(times) * 1000:.0f} ms")
+
+    print("\nSlowest imports (cumulative):")
+    for cumulative_us, module in slowest_imports(args.top):
+        print(f"   {cumulative_us / 1000:8.1f} ms  {module}")
+
+    print("\nFirst-use service initialization (core.registry):")
+    for name, status in service_init_times().items():
+        state = "ok" if status["available"] else f"unavailable ({status['error'] or 'not configured'})"
+        print(f"   {name:<8} {status['init_ms'] or 0:8.1f} ms  {state}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Offline throughput / tail-latency benchmark for run_analysis_for_api
+
+Runs the real analysis pipeline against utils/mock_servers.py and the
+Firestore emulator, so results are repeatable and cost nothing.
+
+    gcloud emulators firestore start --host-port=127.0.0.1:8080
+    python utils/mock_servers.py --latency-ms 800 --error-rate 0.02
+    FIRESTORE_EMULATOR_HOST=127.0.0.1:8080 python utils/load_test.py --scans 40 --concurrency 8 --users 4
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+# Point the backend at the local stand-ins unless told otherwise
+os.environ.setdefault("GEMINI_API_URL", "http://127.0.0.1:8101/v1beta/models/mock:generateContent")
+os.environ.setdefault("LOGGING_API_ENDPOINT", "http://127.0.0.1:8102")
+os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "demo-cloud-rca")
+
+# Add root directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def seed_users(db, users, project_id):
+    """Store a mock credential per load-test user (expiry-less, so no refresh is attempted)."""
+    from google.oauth2.credentials import Credentials
+    from services.credential_manager import store_credentials
+
+    for user_id in users:
+        creds = Credentials(token="mock-access-token", token_uri="https://oauth2.googleapis.com/token")
+        await store_credentials(db, user_id, creds, project_id=project_id)
+
+
+async def run(args):
+    if not os.getenv("FIRESTORE_EMULATOR_HOST"):
+        print("❌ FIRESTORE_EMULATOR_HOST is not set; refusing to load-test a live Firestore.")
+        return
+
+    from core.agent import run_analysis_for_api
+    from core.registry import registry
+    db = registry.get("db")
+    if db is None:
+        print("❌ Firebase not initialized")
+        return
+
+    users = [f"loadtest_user_{i}" for i in range(args.users)]
+    await seed_users(db, users, args.project)
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, insights, errors = [], 0, 0
+
+    async def one_scan(i):
+        nonlocal insights, errors
+        async with semaphore:
+            started = time.perf_counter()
+            result = await run_analysis_for_api(
+                time_range_minutes=60, max_traces=args.max_traces, user_id=users[i % len(users)]
+            )
+            latencies.append(time.perf_counter() - started)
+            insights += len(result.get("results", []))
+            errors += 1 if result.get("error") else 0
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_scan(i) for i in range(args.scans)))
+    elapsed = time.perf_counter() - started
+
+    print("\n" + "=" * 60)
+    print(f"Scans: {args.scans} | Concurrency: {args.concurrency} | Users: {args.users} | max_traces: {args.max_traces}")
+    print(f"Wall time: {elapsed:.2f}s | Throughput: {args.scans / elapsed:.2f} scans/s")
+    print(f"Latency p50: {percentile(latencies, 50):.2f}s | p95: {percentile(latencies, 95):.2f}s | p99: {percentile(latencies, 99):.2f}s")
+    print(f"Insights: {insights} | Failed scans: {errors}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline load test for run_analysis_for_api")
+    parser.add_argument("--scans", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--users", type=int, default=2)
+    parser.add_argument("--max-traces", type=int, default=10)
+    parser.add_argument("--project", default="mock-project")
+    parser.add_argument("--no-fast-path", action="store_true", help="Send every trace to (mock) Gemini")
+    args = parser.parse_args()
+    if args.no_fast_path:
+        # The mock traces are all textbook failures the fast path would absorb
+        os.environ["FAST_PATH_ENABLED"] = "false"
+    asyncio.run(run(args))
@@ -0,0 +1,221 @@
+"""
+Local stand-ins for Gemini and Cloud Logging (offline load testing)
+
+- Mock Gemini:  POST /v1beta/models/<model>:generateContent
+  Configurable latency distribution, 5xx / 429 injection and deterministic
+  JSON analyses derived from the prompt.
+- Mock Logging: POST /v2/entries:list
+  Serves a fixed, seeded set of Cloud Run entries in the
+  `ERROR:cloud-rca:{...}` format that log_collector.parse_log_entry expects,
+  with nextPageToken pagination.
+
+Point the backend at them with:
+    GEMINI_API_URL=http://127.0.0.1:8101/v1beta/models/mock:generateContent
+    LOGGING_API_ENDPOINT=http://127.0.0.1:8102
+
+Usage:
+    python utils/mock_servers.py --latency-ms 800 --latency-sigma 0.6 --error-rate 0.02 --throttle-rate 0.05
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add root directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.error_injector import SCENARIOS
+
+SERVICES = ["payment-api", "checkout-service", "auth-service", "inventory-db", "notification-worker"]
+
+CANNED_ANALYSES = {
+    "Database Config Missing": ("CONFIGURATION_ERROR", "Set DATABASE_URL on the Cloud Run revision and redeploy."),
+    "IAM Permission Failure": ("AUTHENTICATION_FAILURE", "Grant roles/storage.objectViewer to the service account."),
+    "Out of Memory (OOM)": ("SERVICE_UNAVAILABLE", "Raise the memory limit or fix the leak in the hot path."),
+    "Service Timeout": ("NETWORK_TIMEOUT", "Profile the slow dependency and raise the request timeout if justified."),
+    "Broken Deployment (ImportError)": ("DEPENDENCY_FAILURE", "Roll back to the previous revision and fix the import."),
+}
+
+
+class MockConfig:
+    def __init__(self, args):
+        self.latency_ms = args.latency_ms
+        self.latency_sigma = args.latency_sigma
+        self.error_rate = args.error_rate
+        self.throttle_rate = args.throttle_rate
+        self.rng = random.Random(args.seed)
+        self.lock = threading.Lock()
+
+    def draw(self):
+        """Draw (latency_seconds, status_code) for one Gemini call."""
+        with self.lock:
+            if self.latency_sigma > 0:
+                latency = self.rng.lognormvariate(math.log(max(self.latency_ms, 1)), self.latency_sigma)
+            else:
+                latency = self.latency_ms
+            roll = self.rng.random()
+        if roll < self.error_rate:
+            return latency / 1000.0, 503
+        if roll < self.error_rate + self.throttle_rate:
+            return latency / 1000.0, 429
+        return latency / 1000.0, 200
+
+
+def deterministic_analysis(prompt):
+    """Same prompt in, same analysis out."""
+    digest = int(hashlib.sha256(prompt.encode()).hexdigest(), 16)
+    scenario = next((s for s in SCENARIOS if s["payload"][:40] in prompt), SCENARIOS[digest % len(SCENARIOS)])
+    category, action = CANNED_ANALYSES[scenario["name"]]
+    return {
+        "cause": scenario["name"],
+        "category": category,
+        "confidence": 70 + digest % 30,
+        "action": action,
+        "security_alert": category == "AUTHENTICATION_FAILURE",
+        "redacted_summary": scenario["payload"][:120],
+        "priority": ["P0", "P1", "P2"][digest % 3],
+        "correlation_insight": "Mock analysis generated by utils/mock_servers.py",
+    }
+
+
+def build_log_entries(project, traces, logs_per_trace, seed):
+    """Pre-build a deterministic set of Cloud Logging entries (newest first)."""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    entries = []
+    for t in range(traces):
+        trace_id = hashlib.md5(f"{seed}-{t}".encode()).hexdigest()
+        scenario = rng.choice(SCENARIOS)
+        for i in range(logs_per_trace):
+            service = rng.choice(SERVICES)
+            body = {
+                "trace_id": trace_id,
+                "message": scenario["payload"],
+                "service": service,
+                "root_cause": scenario["name"],
+                "suggestion": None,
+            }
+            level = "ERROR" if i == logs_per_trace - 1 else rng.choice(["WARNING", "INFO", "ERROR"])
+            stream = "stderr" if level == "ERROR" else "stdout"
+            timestamp = now - timedelta(seconds=rng.randint(0, 50 * 60))
+            entries.append({
+                "logName": f"projects/{project}/logs/run.googleapis.com%2F{stream}",
+                "resource": {
+                    "type": "cloud_run_revision",
+                    "labels": {"service_name": "cloud-rca-service", "location": "us-central1"},
+                },
+                "timestamp": timestamp.isoformat().replace("+00:00", "Z"),
+                "insertId": f"{trace_id[:12]}-{i}",
+                "textPayload": f"{level}:cloud-rca:{json.dumps(body)}",
+            })
+    entries.sort(key=lambda e: e["timestamp"], reverse=True)
+    return entries
+
+
+def make_gemini_handler(config):
+    class GeminiHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)) or 0)
+            latency, status = config.draw()
+            time.sleep(latency)
+
+            if status != 200:
+                self._reply(status, {"error": {"code": status, "message": "Injected failure"}})
+                return
+
+            try:
+                prompt = json.loads(body)["contents"][0]["parts"][0]["text"]
+            except (ValueError, KeyError, IndexError):
+                self._reply(400, {"error": {"code": 400, "message": "Malformed request"}})
+                return
+
+            if "Reliability Chatbot" in prompt:
+                text = "Mock reply: the most frequent recent incident is a resource exhaustion on payment-api."
+            else:
+                text = json.dumps(deterministic_analysis(prompt))
+            self._reply(200, {"candidates": [{"content": {"parts": [{"text": text}]}, "finishReason": "STOP"}]})
+
+        def _reply(self, status, payload):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return GeminiHandler
+
+
+def make_logging_handler(entries):
+    class LoggingHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)) or 0)
+            request = json.loads(body or b"{}")
+            page_size = int(request.get("pageSize") or 1000)
+            offset = int(request.get("pageToken") or 0)
+
+            page = entries[offset:offset + page_size]
+            payload = {"entries": page}
+            if offset + page_size < len(entries):
+                payload["nextPageToken"] = str(offset + page_size)
+
+            data = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return LoggingHandler
+
+
+def serve(port, handler, name):
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name=name, daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock Gemini and Cloud Logging servers")
+    parser.add_argument("--gemini-port", type=int, default=8101)
+    parser.add_argument("--logging-port", type=int, default=8102)
+    parser.add_argument("--latency-ms", type=float, default=800.0, help="Median Gemini latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Log-normal sigma (0 = fixed latency)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of Gemini calls answered with 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of Gemini calls answered with 429")
+    parser.add_argument("--project", default="mock-project")
+    parser.add_argument("--traces", type=int, default=200)
+    parser.add_argument("--logs-per-trace", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    entries = build_log_entries(args.project, args.traces, args.logs_per_trace, args.seed)
+    serve(args.gemini_port, make_gemini_handler(MockConfig(args)), "mock-gemini")
+    serve(args.logging_port, make_logging_handler(entries), "mock-logging")
+
+    print(f"🧪 Mock Gemini  -> GEMINI_API_URL=http://127.0.0.1:{args.gemini_port}/v1beta/models/mock:generateContent")
+    print(f"🧪 Mock Logging -> LOGGING_API_ENDPOINT=http://127.0.0.1:{args.logging_port} ({len(entries)} entries, {args.traces} traces)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("🛑 Mock servers stopped.")
+
+
+if __name__ == "__main__":
+    main()
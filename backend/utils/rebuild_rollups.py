@@ -0,0 +1,34 @@
+"""
+Recompute the analytics rollup documents from the incidents collection.
+
+Run once after upgrading (incidents written before rollups existed are
+otherwise missing from /analytics) and whenever the counters need to be
+reconciled. Overwrites the rollup documents, so run it while no scans
+are writing incidents.
+
+    python utils/rebuild_rollups.py
+"""
+import os
+import sys
+import time
+import asyncio
+
+# Add root directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+async def main():
+    from core.agent import init_firebase
+    from core.rollups import analytics_rollups
+
+    db = init_firebase()
+    if not db:
+        print("❌ Firebase Failed to initialize")
+        return
+    started = time.perf_counter()
+    result = await analytics_rollups.rebuild(db)
+    print(f"✅ Rebuilt {result['documents']} rollup documents from {result['incidents']} incidents in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,86 +1,246 @@
 import os
 import sys
+import time
 import asyncio
-from datetime import datetime
+from datetime import datetime, timedelta
+from collections import OrderedDict
 
 # Add root directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from core.agent import db
+from core.registry import registry
+from core.metrics import metrics
+from core.logger import get_logger
+from core.events import bus, INCIDENT_CREATED, ALERT_RULES_CHANGED
+from core.incident_store import ALERT_FIELDS, ORIGIN_FIELD, INSTANCE_ID
+from core.pagination import keyset_page
 from services.email_service import email_service
+from workers.threshold_engine import ThresholdEngine
 from google.cloud.firestore_v1.base_query import FieldFilter
 
+logger = get_logger("alert_worker")
+
+LOOP_SECONDS = metrics.histogram("rca_alert_worker_loop_seconds", "Alert rule evaluation time per incident")
+LOOP_ERRORS = metrics.counter("rca_alert_worker_errors_total", "Alert evaluations that raised")
+ALERT_LATENCY = metrics.histogram("rca_alert_latency_seconds", "Incident stored -> alert rules evaluated")
+QUEUE_DEPTH = metrics.gauge("rca_alert_queue_depth", "Incidents waiting for alert evaluation")
+RULE_LOADS = metrics.counter("rca_alert_rule_loads_total", "Firestore reads of the enabled alert rules")
+
+# Safety net for rule edits made by other instances (in-process edits invalidate at once);
+# only checked when an incident arrives, so an idle worker never reads Firestore
+RULES_TTL_SECONDS = float(os.getenv("ALERT_RULES_TTL_SECONDS", "300"))
+# How long evaluated incident ids are remembered in memory (the checkpoint covers restarts)
+DEDUP_WINDOW_SECONDS = float(os.getenv("ALERT_DEDUP_WINDOW_SECONDS", "3600"))
+# After downtime, replay at most this far back instead of alerting on old history
+CATCHUP_MAX_AGE = timedelta(hours=float(os.getenv("ALERT_CATCHUP_MAX_HOURS", "24")))
+# One checkpoint per instance: each worker only sees incidents from its own in-process bus
+CHECKPOINT_COLLECTION, CHECKPOINT_DOC = "worker_state", f"alert_worker-{INSTANCE_ID}"
+CATCHUP_PAGE_SIZE = 200
+# A failed evaluation is retried with capped backoff until it succeeds; the checkpoint
+# stays before the incident meanwhile, so later incidents wait rather than skip it
+EVAL_BACKOFF_MAX_SECONDS = float(os.getenv("ALERT_RETRY_MAX_SECONDS", "30"))
+
+class RecentIds:
+    """Ids added within the last `window_seconds`, held in `slices` time buckets; memory ~ rate x window."""
+
+    def __init__(self, window_seconds, slices=12):
+        self.slice_seconds = window_seconds / slices
+        self.slices = slices
+        self._buckets = OrderedDict()  # slice index -> ids
+
+    def _prune(self):
+        oldest = int(time.monotonic() // self.slice_seconds) - self.slices + 1
+        while self._buckets and next(iter(self._buckets)) < oldest:
+            self._buckets.popitem(last=False)
+
+    def add(self, item):
+        self._prune()
+        self._buckets.setdefault(int(time.monotonic() // self.slice_seconds), set()).add(item)
+
+    def __contains__(self, item):
+        self._prune()
+        return any(item in ids for ids in self._buckets.values())
+
+    def __len__(self):
+        return sum(len(ids) for ids in self._buckets.values())
+
 class AlertWorker:
+    """
+    Evaluates alert rules as incidents are stored: the agent publishes
+    incident.created on core.events and the worker matches it right away,
+    with no polling. Enabled rules are cached until alert_rules changes.
+
+    After each incident the (timestamp, id) of the newest one evaluated is
+    persisted to worker_state/alert_worker-{INSTANCE_ID}; on startup the
+    worker replays this instance's incidents (origin == INSTANCE_ID) stored
+    after it before taking live events, so a restart neither re-alerts nor
+    skips. INSTANCE_ID must therefore be stable across restarts. Recent ids are deduplicated in memory.
+    An incident whose evaluation fails is retried with capped backoff and
+    never checkpointed past, so an outage delays alerts but drops none.
+    """
     def __init__(self):
-        self.db = db
         self.running = False
-        self._thread = None
-        self.processed_incidents = set()
+        self._task = None
+        self._queue = None
+        self._rules = None
+        self._rules_loaded_at = 0.0
+        self._engine = ThresholdEngine()
+        self.processed_incidents = RecentIds(DEDUP_WINDOW_SECONDS)
+        self._checkpoint = None  # (timestamp, id) of the newest incident evaluated
 
     async def start(self):
         if self.running:
             return
         self.running = True
+        self._queue = asyncio.Queue()
+        bus.subscribe(INCIDENT_CREATED, self._enqueue)
+        bus.subscribe(ALERT_RULES_CHANGED, self._invalidate_rules)
         # Create background task
-        asyncio.create_task(self._run_loop())
-        print("🤖 Alert Worker started. Monitoring incidents...")
+        self._task = asyncio.create_task(self._run_loop(), name="alert-worker")
+        logger.info("🤖 Alert Worker started. Monitoring incidents...")
 
     async def stop(self):
         self.running = False
-        print("🤖 Alert Worker stopped.")
+        bus.unsubscribe(INCIDENT_CREATED, self._enqueue)
+        bus.unsubscribe(ALERT_RULES_CHANGED, self._invalidate_rules)
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        logger.info("🤖 Alert Worker stopped.")
+
+    # --- event bus handlers ---
+    def _enqueue(self, event):
+        self._queue.put_nowait((event["id"], event["data"], time.perf_counter()))
+        QUEUE_DEPTH.set(self._queue.qsize())
+
+    def _invalidate_rules(self, _event=None):
+        self._rules = None
 
     async def _run_loop(self):
+        # Live events queue up meanwhile, so the checkpoint only ever moves forward
+        await self._retrying("catch-up", self._catch_up)
         while self.running:
+            incident_id, incident, queued_at = await self._queue.get()
+            QUEUE_DEPTH.set(self._queue.qsize())
+            await self._process(incident_id, incident)
+            ALERT_LATENCY.observe(time.perf_counter() - queued_at)
+
+    async def _retrying(self, what, fn, *args):
+        """Run `fn` until it succeeds, backing off up to EVAL_BACKOFF_MAX_SECONDS (e.g. through a Firestore outage)."""
+        attempt = 0
+        while True:
             try:
-                await self._check_and_trigger_alerts()
+                return await fn(*args)
             except Exception as e:
-                print(f"❌ Alert Worker Error: {e}")
-            await asyncio.sleep(10) # Check every 10 seconds
+                LOOP_ERRORS.inc()
+                attempt += 1
+                delay = min(2 ** attempt, EVAL_BACKOFF_MAX_SECONDS)
+                logger.warning(f"⚠️ Alert Worker {what} failed (attempt {attempt}), retrying in {delay:.0f}s: {e}")
+                # Reload rules on retry in case the cached set is what failed
+                self._invalidate_rules()
+                await asyncio.sleep(delay)
+
+    async def _evaluate(self, incident_id, incident):
+        with LOOP_SECONDS.time():
+            await self._check_and_trigger_alerts(incident_id, incident)
+
+    async def _process(self, incident_id, incident):
+        """Evaluate one incident (retrying until it succeeds); only then is it marked and checkpointed."""
+        if incident_id in self.processed_incidents:
+            return
+        await self._retrying(f"evaluation of {incident_id}", self._evaluate, incident_id, incident)
+        self.processed_incidents.add(incident_id)
+        await self._save_checkpoint(incident.get("timestamp"), incident_id)
 
-    async def _check_and_trigger_alerts(self):
-        if not self.db:
+    # --- checkpoint ---
+    async def _catch_up(self):
+        """Evaluate incidents stored after the persisted checkpoint (e.g. while this process was down)."""
+        db = await asyncio.to_thread(registry.get, "db")
+        if not db:
+            return
+        doc = await db.collection(CHECKPOINT_COLLECTION).document(CHECKPOINT_DOC).get()
+        if not doc.exists:
+            # First run: start from now rather than alerting on history
             return
+        data = doc.to_dict()
+        self._checkpoint = (data.get("timestamp") or "", data.get("id") or "")
+        oldest = (datetime.now() - CATCHUP_MAX_AGE).isoformat()
+        after = self._checkpoint if self._checkpoint >= (oldest, "") and self._checkpoint[1] else None
+        replayed = 0
+        while True:
+            docs = await keyset_page(
+                db.collection("incidents"), "timestamp", {ORIGIN_FIELD: INSTANCE_ID}, CATCHUP_PAGE_SIZE,
+                after=after, fields=ALERT_FIELDS, descending=False, start=None if after else oldest
+            )
+            for incident_doc in docs:
+                await self._process(incident_doc.id, incident_doc.to_dict())
+            replayed += len(docs)
+            if len(docs) < CATCHUP_PAGE_SIZE:
+                break
+            after = (docs[-1].to_dict().get("timestamp"), docs[-1].id)
+        if replayed:
+            logger.info(f"⏩ Alert Worker replayed {replayed} incidents stored since its last checkpoint")
 
-        # 1. Fetch active alert rules
-        rules_docs = await self.db.collection("alert_rules").where(filter=FieldFilter("enabled", "==", True)).get()
-        rules = [d.to_dict() for d in rules_docs]
+    async def _save_checkpoint(self, timestamp, incident_id):
+        key = (timestamp or "", incident_id)
+        if self._checkpoint is not None and key <= self._checkpoint:
+            return
+        self._checkpoint = key
+        db = registry.get("db")
+        if not db:
+            return
+        try:
+            await db.collection(CHECKPOINT_COLLECTION).document(CHECKPOINT_DOC).set(
+                {"timestamp": key[0], "id": incident_id, "updated_at": datetime.now().isoformat()}
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Alert Worker checkpoint write failed: {e}")
+
+    async def _get_rules(self):
+        if self._rules is not None and time.monotonic() - self._rules_loaded_at < RULES_TTL_SECONDS:
+            return self._rules
+        # First access may initialize Firebase; keep that off the event loop
+        db = await asyncio.to_thread(registry.get, "db")
+        if not db:
+            return []
+        rules_docs = await db.collection("alert_rules").where(filter=FieldFilter("enabled", "==", True)).get()
+        self._rules = [{"id": d.id, **d.to_dict()} for d in rules_docs]
+        self._engine.load(self._rules)
+        self._rules_loaded_at = time.monotonic()
+        RULE_LOADS.inc()
+        return self._rules
+
+    async def _check_and_trigger_alerts(self, incident_id, incident):
+        rules = await self._get_rules()
         if not rules:
             return
 
-        # 2. Fetch recent incidents (last 5 minutes)
-        # For simplicity in this demo, we'll just track seen IDs in memory
-        incidents_docs = await self.db.collection("incidents").order_by("timestamp", direction="DESCENDING").limit(20).get()
-        
-        for doc in incidents_docs:
-            incident = doc.to_dict()
-            incident_id = doc.id
-            
-            if incident_id in self.processed_incidents:
-                continue
-            
-            # Match against rules
-            category = incident.get('analysis', {}).get('category', 'unknown')
-            
-            for rule in rules:
-                if rule.get('category').lower() == category.lower():
-                    print(f"🎯 ALERT MATCH: Incident {incident_id} matches rule '{rule['name']}' (Category: {category})")
-                    
-                    # Send alert to a default recipient or user who created the rule
-                    # In a real app, we'd look up the user's email. For now using GMAIL_USER as recipient.
-                    recipient = os.getenv("GMAIL_USER")
-                    if recipient:
-                        await email_service.send_alert_email(
-                            recipient, 
-                            rule['name'], 
-                            {
-                                'trace_id': incident.get('trace_id'),
-                                'category': category,
-                                'priority': incident.get('priority'),
-                                'redacted_text': incident.get('redacted_text')
-                            }
-                        )
-            
-            self.processed_incidents.add(incident_id)
+        # Only the rules compiled for this category are checked
+        category = incident.get('analysis', {}).get('category', 'unknown')
+
+        for rule, count in self._engine.evaluate(category, incident.get('timestamp')):
+            logger.info(
+                f"🎯 ALERT FIRED: rule '{rule['name']}' saw {count} {category} incidents in {rule.get('window_minutes')}m "
+                f"(latest {incident_id})",
+                extra={"incident_id": incident_id, "rule": rule['name'], "category": category, "count": count}
+            )
+
+            # Send alert to a default recipient or user who created the rule
+            # In a real app, we'd look up the user's email. For now using GMAIL_USER as recipient.
+            recipient = os.getenv("GMAIL_USER")
+            if recipient:
+                await email_service.send_alert_email(
+                    recipient,
+                    rule['name'],
+                    {
+                        'trace_id': incident.get('trace_id'),
+                        'category': category,
+                        'priority': incident.get('priority'),
+                        'redacted_text': incident.get('redacted_text'),
+                        'count': count,
+                        'window_minutes': rule.get('window_minutes')
+                    }
+                )
 
 # Singleton instance
 alert_worker = AlertWorker()
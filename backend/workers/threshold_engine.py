@@ -0,0 +1,134 @@
+"""
+Sliding-Window Threshold Engine for Alert Rules
+
+An AlertRule fires when more than `threshold` matching incidents arrive
+within `window_minutes` (the "> N events in W minutes" shown in the UI),
+then stays quiet for its cooldown (`cooldown_minutes`, defaulting to the
+window; 0 disables).
+
+Rules are compiled into a category -> rules index when they are loaded,
+so an incident is only checked against the rules for its category. Each
+(rule, category) keeps a ring buffer of per-minute counts with a running
+total: adding an incident and reading the window total are O(1)
+amortized. Incident timestamps are used as event time, so replayed
+incidents land in the window they belong to.
+"""
+import time
+from datetime import datetime
+
+
+def _minute(timestamp):
+    """Epoch minute of an ISO timestamp (now if missing or unparsable)."""
+    try:
+        return int(datetime.fromisoformat(timestamp).timestamp() // 60)
+    except (TypeError, ValueError):
+        return int(time.time() // 60)
+
+
+class SlidingCounter:
+    """Events per minute over the last `window` minutes, in a ring of `window` buckets."""
+
+    def __init__(self, window):
+        self.window = max(1, int(window))
+        self._counts = [0] * self.window
+        self._minutes = [None] * self.window
+        self.head = None  # newest minute seen
+        self.total = 0
+
+    def add(self, minute):
+        if self.head is None or minute > self.head:
+            if self.head is not None:
+                # Expire the buckets that slid out of the window
+                for m in range(max(self.head + 1, minute - self.window + 1), minute + 1):
+                    self._expire(m % self.window)
+            self.head = minute
+        elif minute <= self.head - self.window:
+            return self.total  # older than the window
+        i = minute % self.window
+        if self._minutes[i] != minute:
+            self._expire(i)
+            self._minutes[i] = minute
+        self._counts[i] += 1
+        self.total += 1
+        return self.total
+
+    def _expire(self, i):
+        self.total -= self._counts[i]
+        self._counts[i] = 0
+        self._minutes[i] = None
+
+    def reset(self):
+        self._counts = [0] * self.window
+        self._minutes = [None] * self.window
+        self.total = 0
+
+
+class _CompiledRule:
+    __slots__ = ("id", "rule", "category", "threshold", "window", "cooldown")
+
+    def __init__(self, rule_id, rule):
+        self.id = rule_id
+        self.rule = rule
+        self.category = (rule.get("category") or "").lower()
+        self.threshold = int(rule.get("threshold") or 0)
+        self.window = max(1, int(rule.get("window_minutes") or 1))
+        cooldown = rule.get("cooldown_minutes")
+        self.cooldown = self.window if cooldown is None else max(0, int(cooldown))
+
+    def signature(self):
+        return (self.category, self.window)
+
+
+class ThresholdEngine:
+    def __init__(self):
+        self._index = {}  # category -> [compiled rules]
+        self._counters = {}  # (rule id, category) -> SlidingCounter
+        self._last_fired = {}  # (rule id, category) -> epoch minute
+        self._signatures = {}
+
+    def load(self, rules):
+        """(Re)compile `rules` (dicts with an "id"); window state survives for unchanged rules."""
+        index = {}
+        signatures = {}
+        for rule in rules:
+            compiled = _CompiledRule(rule.get("id") or rule.get("name"), rule)
+            index.setdefault(compiled.category, []).append(compiled)
+            signatures[compiled.id] = compiled.signature()
+        # Drop state of rules that were removed or whose category/window changed
+        for key in list(self._counters):
+            if signatures.get(key[0]) != self._signatures.get(key[0]):
+                self._counters.pop(key, None)
+                self._last_fired.pop(key, None)
+        self._index = index
+        self._signatures = signatures
+
+    def evaluate(self, category, timestamp=None):
+        """Count one incident of `category`; returns [(rule, count in window)] for the rules that fire."""
+        category = (category or "unknown").lower()
+        rules = self._index.get(category)
+        if not rules:
+            return []
+        minute = _minute(timestamp)
+        fired = []
+        for compiled in rules:
+            key = (compiled.id, category)
+            counter = self._counters.get(key)
+            if counter is None:
+                counter = self._counters[key] = SlidingCounter(compiled.window)
+            count = counter.add(minute)
+            if count <= compiled.threshold:
+                continue
+            last = self._last_fired.get(key)
+            if last is not None and minute - last < compiled.cooldown:
+                continue
+            self._last_fired[key] = minute
+            counter.reset()
+            fired.append((compiled.rule, count))
+        return fired
+
+    def stats(self):
+        return {
+            "rules": sum(len(rules) for rules in self._index.values()),
+            "categories": len(self._index),
+            "windows": len(self._counters),
+        }